@@ -0,0 +1,144 @@
+"""
+Combined multi-metric judge vs one GEval call per metric.
+
+Runs the multi-metric categories (mismatches, finances, bias by default) in
+both modes and reports judge calls, prompt tokens, wall time and per-scenario
+judge latency for each, plus how well the combined verdicts agree with the
+separate ones (same PASS/FAIL, mean absolute score difference, per metric).
+
+Against the stand-ins the scores are hashes of the prompt, so only the call,
+token and latency figures mean anything there. With --live the judge is the
+real Azure deployment from your .env file and the triage outputs are replayed
+from the scenarios' output.json files, which makes the agreement figures real.
+
+    python -m benchmarks.bench_combined --judge-latency fixed:0.5 --output bench_combined.json
+    python -m benchmarks.bench_combined --live --categories finances bias
+"""
+import argparse
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from benchmarks.common import CATEGORIES, load_batch, make_runner, stub_backends, write_results
+import src.test_azure as test_azure
+from src.combined_judge import CombinedJudge
+from src.judge_usage import get_judge_usage, reset_judge_usage
+from src.prechecks import PRECHECK_RESULT
+from src.test_azure import AzureOpenAIModel
+
+MULTI_METRIC_CATEGORIES = sorted(name for name, category in CATEGORIES.items() if len(category["metrics"]) > 1)
+
+
+@contextmanager
+def live_backends():
+    """The real judge from the AZURE_OPENAI_* settings, with triage outputs replayed from testdata."""
+    saved = test_azure.TRIAGE_CACHE_MODE
+    test_azure.TRIAGE_CACHE_MODE = "replay"
+    reset_judge_usage()
+    model = AzureOpenAIModel(
+        os.environ["AZURE_OPENAI_API_KEY"], os.environ["AZURE_OPENAI_ENDPOINT"],
+        os.environ.get("AZURE_OPENAI_API_VERSION"), os.environ["AZURE_OPENAI_DEPLOYMENT_NAME"], 1.0,
+    )
+    try:
+        yield None, None, model
+    finally:
+        test_azure.TRIAGE_CACHE_MODE = saved
+        reset_judge_usage()
+
+
+def run_mode(model, categories: list, concurrency: int, combined: bool) -> tuple:
+    """Runs the categories in one mode. Returns (summary, {(category, scenario, metric): result})."""
+    judge = CombinedJudge() if combined else None
+    runner = make_runner(model, concurrency, combined=judge)
+    usage_before = get_judge_usage().totals()
+    verdicts = {}
+    judge_seconds = []
+
+    start = time.perf_counter()
+    batch = load_batch(categories)
+    for category, scenario in batch:
+        result = runner.result_for(category, scenario, batch)
+        # Time spent waiting for the judge: the slowest metric phase (separate metrics run concurrently)
+        judge_seconds.append(max((seconds for phase, seconds in result.timings.as_dict().items()
+                                  if phase.startswith("metric:")), default=0.0))
+        for metric, data in result.results.items():
+            verdicts[(category, scenario["scenario_name"], metric)] = data
+    elapsed = time.perf_counter() - start
+    runner.close()
+
+    usage = get_judge_usage().totals()
+    summary = {
+        "mode": "combined" if combined else "separate",
+        "scenarios": len(batch),
+        "wall_seconds": round(elapsed, 3),
+        "judge_calls": usage["calls"] - usage_before["calls"],
+        "judge_prompt_tokens": usage["prompt_tokens"] - usage_before["prompt_tokens"],
+        "judge_completion_tokens": usage["completion_tokens"] - usage_before["completion_tokens"],
+        "judge_seconds_per_scenario": round(statistics.fmean(judge_seconds), 4) if judge_seconds else 0.0,
+    }
+    if judge is not None:
+        summary["combined"] = judge.stats()
+    return summary, verdicts
+
+
+def agreement(separate: dict, combined: dict) -> dict:
+    """How often the combined judge reaches the same verdict as separate calls, overall and per metric."""
+    per_metric = {}
+    for key, data in separate.items():
+        other = combined.get(key)
+        # Pre-checks and errors are not judge verdicts
+        if other is None or key[2] == PRECHECK_RESULT or "ERROR" in (data["status"], other["status"]):
+            continue
+        row = per_metric.setdefault(key[2], {"compared": 0, "same_status": 0, "score_diffs": []})
+        row["compared"] += 1
+        row["same_status"] += data["status"] == other["status"]
+        row["score_diffs"].append(abs(data["score"] - other["score"]))
+
+    def summarise(rows):
+        compared = sum(row["compared"] for row in rows)
+        diffs = [diff for row in rows for diff in row["score_diffs"]]
+        return {
+            "compared": compared,
+            "status_agreement": round(sum(row["same_status"] for row in rows) / compared, 4) if compared else None,
+            "mean_abs_score_diff": round(statistics.fmean(diffs), 4) if diffs else None,
+        }
+
+    return {"overall": summarise(list(per_metric.values())),
+            "per_metric": {metric: summarise([row]) for metric, row in sorted(per_metric.items())}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", nargs="+", default=MULTI_METRIC_CATEGORIES, choices=sorted(CATEGORIES))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--triage-latency", default="0")
+    parser.add_argument("--judge-latency", default="fixed:0.5")
+    parser.add_argument("--per-token-latency", type=float, default=0.0,
+                        help="Extra stand-in judge seconds per prompt token, so shorter prompts answer faster.")
+    parser.add_argument("--live", action="store_true", help="Use the real Azure judge (AZURE_OPENAI_*) instead of the stand-in.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    modes = []
+    verdicts = {}
+    for combined in (False, True):
+        # Fresh backends per mode so the modes do not influence each other
+        backends = live_backends() if args.live else stub_backends(args.triage_latency, args.judge_latency, seed=args.seed)
+        with backends as (_, judge_stub, model):
+            if judge_stub is not None:
+                judge_stub.per_token_latency = args.per_token_latency
+            summary, verdicts[combined] = run_mode(model, args.categories, args.concurrency, combined)
+            modes.append(summary)
+
+    write_results({
+        "benchmark": "combined_judge",
+        "categories": args.categories,
+        "judge": "live" if args.live else f"stub {args.judge_latency}",
+        "modes": modes,
+        "agreement": agreement(verdicts[False], verdicts[True]),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
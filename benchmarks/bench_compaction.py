@@ -0,0 +1,112 @@
+"""
+Judge prompt tokens with and without compact payloads, per category.
+
+Runs the selected categories with JUDGE_COMPACT=off (pretty-printed input and
+triage output, as in the Allure report) and on (minified, key-sorted JSON
+without nulls and placeholder fields, see src/compaction.py), and reports per
+category the judge calls, prompt tokens and cost of each mode and the share
+of prompt tokens saved. The payload columns count the characters of the input
+and output alone.
+
+The stand-in judge estimates tokens as characters / 4, which counts
+indentation runs in full; real tokenizers merge runs of spaces, so use --live
+(the real Azure judge from your .env file, triage outputs replayed from
+testdata) for the token figures to quote.
+
+    python -m benchmarks.bench_compaction --output bench_compaction.json
+    python -m benchmarks.bench_compaction --live --categories tierA finances
+"""
+import argparse
+import os
+from collections import defaultdict
+from benchmarks.bench_combined import live_backends
+from benchmarks.common import CATEGORIES, load_batch, make_runner, stub_backends, write_results
+from src.compaction import COMPACT_MODES, compact_json
+from src.engine import TESTDATA_DIR
+from src.judge_usage import get_judge_usage
+
+# Categories whose scenario input files are all present
+COMPLETE_CATEGORIES = sorted(
+    name for name in CATEGORIES
+    if all(os.path.exists(os.path.join(TESTDATA_DIR, scenario["input_file"])) for _, scenario in load_batch([name]))
+)
+
+
+def run_mode(model, categories: list, concurrency: int, mode: str) -> dict:
+    """Judge usage and payload size per category with JUDGE_COMPACT=mode."""
+    saved = os.environ.get("JUDGE_COMPACT")
+    os.environ["JUDGE_COMPACT"] = mode
+    payload_chars = defaultdict(int)
+    try:
+        runner = make_runner(model, concurrency)
+        batch = load_batch(categories)
+        for category, scenario in batch:
+            test_case = runner.result_for(category, scenario, batch).test_case
+            if test_case is None:
+                continue
+            for text in (test_case.input, test_case.actual_output):
+                payload_chars[category] += len(compact_json(text) if mode == "on" else text)
+        runner.close()
+    finally:
+        if saved is None:
+            os.environ.pop("JUDGE_COMPACT", None)
+        else:
+            os.environ["JUDGE_COMPACT"] = saved
+
+    per_category = defaultdict(lambda: {"judge_calls": 0, "judge_prompt_tokens": 0, "judge_cost": 0.0})
+    for row in get_judge_usage().as_rows():
+        totals = per_category[row["category"]]
+        totals["judge_calls"] += row["calls"]
+        totals["judge_prompt_tokens"] += row["prompt_tokens"]
+        totals["judge_cost"] += row["cost"]
+    return {category: {**per_category[category], "payload_chars": payload_chars[category]} for category in categories}
+
+
+def savings(before: int, after: int) -> float:
+    return round(1 - after / before, 4) if before else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", nargs="+", default=COMPLETE_CATEGORIES, choices=sorted(CATEGORIES))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--triage-latency", default="0")
+    parser.add_argument("--judge-latency", default="0")
+    parser.add_argument("--live", action="store_true", help="Use the real Azure judge (AZURE_OPENAI_*) instead of the stand-in.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    modes = {}
+    for mode in reversed(COMPACT_MODES):
+        # Fresh backends (and judge usage) per mode
+        backends = live_backends() if args.live else stub_backends(args.triage_latency, args.judge_latency, seed=args.seed)
+        with backends as (_, _, model):
+            modes[mode] = run_mode(model, args.categories, args.concurrency, mode)
+
+    categories = {}
+    for category in args.categories:
+        off, on = modes["off"][category], modes["on"][category]
+        categories[category] = {
+            "off": off,
+            "on": on,
+            "prompt_tokens_saved": savings(off["judge_prompt_tokens"], on["judge_prompt_tokens"]),
+            "payload_chars_saved": savings(off["payload_chars"], on["payload_chars"]),
+        }
+    totals = {mode: {field: sum(modes[mode][category][field] for category in args.categories)
+                     for field in ("judge_calls", "judge_prompt_tokens", "payload_chars")} for mode in modes}
+
+    write_results({
+        "benchmark": "compaction",
+        "judge": "live" if args.live else f"stub {args.judge_latency}",
+        "categories": categories,
+        "total": {
+            **totals,
+            "prompt_tokens_saved": savings(totals["off"]["judge_prompt_tokens"], totals["on"]["judge_prompt_tokens"]),
+            "payload_chars_saved": savings(totals["off"]["payload_chars"], totals["on"]["payload_chars"]),
+        },
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+End-to-end scenario latency breakdown.
+
+Runs a fixed subset of the manifests against the local stand-ins and reports
+percentile timings per phase: manifest load, input read/serialise, triage API
+call, retries, throttle waits, each GEval metric and Allure attachment
+writing. Save the JSON per commit to catch regressions in harness overhead.
+
+    python -m benchmarks.bench_latency --output bench_latency.json
+    python -m benchmarks.bench_latency --triage-latency lognormal:0,0.5 --triage-rate-limit 2
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import uuid
+from allure_commons.logger import AllureFileLogger
+from benchmarks.common import CATEGORIES, make_runner, stub_backends, write_results
+from src.engine import load_manifest
+from src.runner import metric_details
+
+
+def percentiles(values: list) -> dict:
+    values = sorted(values)
+
+    def pick(q):
+        return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 6),
+        "p50": round(pick(0.50), 6),
+        "p90": round(pick(0.90), 6),
+        "p95": round(pick(0.95), 6),
+        "p99": round(pick(0.99), 6),
+        "max": round(values[-1], 6),
+    }
+
+
+def write_allure_attachments(logger: AllureFileLogger, result) -> float:
+    """Writes the same attachments the test suite attaches per scenario; returns the seconds taken."""
+    start = time.perf_counter()
+    logger.report_attached_data(result.test_case.input, f"{uuid.uuid4()}-attachment.json")
+    logger.report_attached_data(result.test_case.actual_output, f"{uuid.uuid4()}-attachment.json")
+    for name, data in result.results.items():
+        logger.report_attached_data(metric_details(name, data), f"{uuid.uuid4()}-attachment.txt")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", nargs="+", default=["tierA", "mismatches"], choices=sorted(CATEGORIES))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--triage-latency", default="fixed:0.05")
+    parser.add_argument("--judge-latency", default="fixed:0.05")
+    parser.add_argument("--triage-rate-limit", type=float, default=0.0, help="Stand-in limit, requests/second.")
+    parser.add_argument("--judge-rate-limit", type=float, default=0.0, help="Stand-in limit, requests/second.")
+    parser.add_argument("--client-rate", type=float, default=1000.0, help="Starting rate of the harness limiters.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    phase_samples = {}
+    scenario_timings = []
+    manifest_load = []
+    allure_dir = tempfile.mkdtemp(prefix="bench_allure_")
+    allure_logger = AllureFileLogger(allure_dir)
+
+    with stub_backends(args.triage_latency, args.judge_latency, args.triage_rate_limit,
+                       args.judge_rate_limit, args.client_rate, args.seed) as (triage_stub, judge_stub, model):
+        runner = make_runner(model, args.concurrency)
+        start = time.perf_counter()
+        batch = []
+        for category in args.categories:
+            load_start = time.perf_counter()
+            scenarios = load_manifest(CATEGORIES[category]["manifest"])
+            manifest_load.append(time.perf_counter() - load_start)
+            batch.extend((category, scenario) for scenario in scenarios)
+
+        # One batch across the categories, as in a pytest run
+        for category, scenario in batch:
+            result = runner.result_for(category, scenario, batch)
+            phases = result.timings.as_dict()
+            phases["allure_attach"] = write_allure_attachments(allure_logger, result)
+            scenario_timings.append(phases)
+        wall_seconds = time.perf_counter() - start
+        runner.close()
+
+    # Scenarios that never hit a phase (e.g. no throttling) count as 0s for it,
+    # except metrics, which are only compared across the categories that use them
+    all_phases = sorted({phase for phases in scenario_timings for phase in phases})
+    for phase in all_phases:
+        if phase.startswith("metric:"):
+            samples = [phases[phase] for phases in scenario_timings if phase in phases]
+        else:
+            samples = [phases.get(phase, 0.0) for phases in scenario_timings]
+        phase_samples[phase] = percentiles(samples)
+    phase_samples["manifest_load"] = percentiles(manifest_load)
+
+    write_results({
+        "benchmark": "latency_breakdown",
+        "categories": args.categories,
+        "concurrency": args.concurrency,
+        "triage_latency": args.triage_latency,
+        "judge_latency": args.judge_latency,
+        "scenarios": len(scenario_timings),
+        "wall_seconds": round(wall_seconds, 3),
+        "phases": phase_samples,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Judge prompt layouts and Azure prompt caching.
+
+Runs the selected categories with each judge prompt layout (JUDGE_PROMPT_LAYOUT,
+see src/judge_prompts.py) and reports prompt tokens, how many of them were
+served from the prompt cache, the judge cost at JUDGE_PRICES and
+JUDGE_CACHED_PRICE_FACTOR, and per-scenario judge latency.
+
+The stand-in judge simulates Azure's cache (the longest prompt prefix seen
+before, from 1,024 tokens in 128-token steps) and, with --per-token-latency,
+answers faster for cached tokens. With --live the judge is the real Azure
+deployment from your .env file (triage outputs replayed from testdata), whose
+usage reports the cached tokens itself.
+
+    python -m benchmarks.bench_prompt_cache --categories tierB mismatches --per-token-latency 0.0002
+    RETRIEVAL_MODE=full python -m benchmarks.bench_prompt_cache --output bench_prompt_cache.json
+"""
+import argparse
+import os
+import statistics
+import time
+from benchmarks.bench_combined import live_backends
+from benchmarks.common import CATEGORIES, load_batch, make_runner, stub_backends, write_results
+from src.judge_prompts import PROMPT_LAYOUTS
+from src.judge_usage import get_judge_usage
+
+
+def run_layout(model, categories: list, concurrency: int, layout: str) -> dict:
+    """Runs the categories with one prompt layout (the metrics are built by make_runner's engine)."""
+    saved = os.environ.get("JUDGE_PROMPT_LAYOUT")
+    os.environ["JUDGE_PROMPT_LAYOUT"] = layout
+    try:
+        runner = make_runner(model, concurrency)
+        judge_seconds = []
+        start = time.perf_counter()
+        batch = load_batch(categories)
+        for category, scenario in batch:
+            result = runner.result_for(category, scenario, batch)
+            judge_seconds.append(max((seconds for phase, seconds in result.timings.as_dict().items()
+                                      if phase.startswith("metric:")), default=0.0))
+        elapsed = time.perf_counter() - start
+        runner.close()
+    finally:
+        if saved is None:
+            os.environ.pop("JUDGE_PROMPT_LAYOUT", None)
+        else:
+            os.environ["JUDGE_PROMPT_LAYOUT"] = saved
+
+    usage = get_judge_usage().totals()
+    return {
+        "layout": layout,
+        "scenarios": len(batch),
+        "wall_seconds": round(elapsed, 3),
+        "judge_calls": usage["calls"],
+        "judge_prompt_tokens": usage["prompt_tokens"],
+        "judge_cached_tokens": usage["cached_tokens"],
+        "cached_share": round(usage["cached_tokens"] / usage["prompt_tokens"], 4) if usage["prompt_tokens"] else 0.0,
+        "judge_cost": round(usage["cost"], 6),
+        "judge_seconds_per_scenario": round(statistics.fmean(judge_seconds), 4) if judge_seconds else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", nargs="+", default=["tierB", "mismatches", "finances"], choices=sorted(CATEGORIES))
+    parser.add_argument("--layouts", nargs="+", default=list(reversed(PROMPT_LAYOUTS)), choices=PROMPT_LAYOUTS)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--triage-latency", default="0")
+    parser.add_argument("--judge-latency", default="0")
+    parser.add_argument("--per-token-latency", type=float, default=0.0,
+                        help="Extra stand-in judge seconds per uncached prompt token.")
+    parser.add_argument("--live", action="store_true", help="Use the real Azure judge (AZURE_OPENAI_*) instead of the stand-in.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    layouts = []
+    for layout in args.layouts:
+        # Fresh backends per layout, so one layout does not warm the cache for the other
+        backends = live_backends() if args.live else stub_backends(args.triage_latency, args.judge_latency, seed=args.seed)
+        with backends as (_, judge_stub, model):
+            if judge_stub is not None:
+                judge_stub.per_token_latency = args.per_token_latency
+            layouts.append(run_layout(model, args.categories, args.concurrency, layout))
+
+    write_results({
+        "benchmark": "prompt_cache",
+        "categories": args.categories,
+        "retrieval_mode": os.environ.get("RETRIEVAL_MODE", "select"),
+        "judge": "live" if args.live else f"stub {args.judge_latency}",
+        "layouts": layouts,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Startup-time benchmark for the test suite.
+
+Times fresh interpreter runs of the steps that decide how quickly a run
+gets going: importing conftest, collecting every test, collecting one
+scenario, importing the heavy harness module (deepeval + openai), and a
+full single-scenario run against the local stand-ins. Each step is run
+--repeat times and the median/min wall time reported.
+
+    python -m benchmarks.bench_startup --repeat 5 --output bench_startup.json
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.common import write_results
+from src.stubs.common import Latency
+from src.stubs.judge_server import JudgeStub, start_judge_stub
+from src.stubs.triage_server import TriageStub, TRIAGE_PATH, load_recordings, start_triage_stub
+
+ONE_SCENARIO = "tests/test_scenarios.py::test_scenario[tierA-Atier_AboveMaxDTI]"
+
+
+def time_command(args: list, env: dict, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable] + args, env=env, capture_output=True, text=True)
+        samples.append(time.perf_counter() - start)
+        # pytest exits 1 when a scenario fails its metrics; anything else means the step itself broke
+        if completed.returncode not in (0, 1):
+            raise RuntimeError(f"{' '.join(args)} exited {completed.returncode}:\n{completed.stdout}{completed.stderr}")
+    return {
+        "median_seconds": round(statistics.median(samples), 3),
+        "min_seconds": round(min(samples), 3),
+        "runs": repeat,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    env = dict(os.environ, DEEPEVAL_TELEMETRY_OPT_OUT="YES", PYTHONDONTWRITEBYTECODE="1")
+    steps = {
+        "python_baseline": ["-c", "pass"],
+        "import_conftest": ["-c", "import tests.conftest"],
+        "import_harness": ["-c", "import src.test_azure"],
+        "collect_all": ["-m", "pytest", "--collect-only", "-q", "-p", "no:cacheprovider"],
+        "collect_one_scenario": ["-m", "pytest", "--collect-only", "-q", "-p", "no:cacheprovider", ONE_SCENARIO],
+    }
+    results = {name: time_command(step, env, args.repeat) for name, step in steps.items()}
+
+    # A whole single-scenario iteration, with the triage endpoint and judge replaced by the stand-ins
+    triage_stub = TriageStub(load_recordings(), latency=Latency("0"))
+    judge_stub = JudgeStub(latency=Latency("0"))
+    with start_triage_stub(triage_stub) as triage_server, start_judge_stub(judge_stub) as judge_server:
+        run_env = dict(
+            env,
+            TRIAGE_API_ENDPOINT=triage_server.base_url + TRIAGE_PATH,
+            TRIAGE_CACHE_MODE="off",
+            AZURE_OPENAI_ENDPOINT=judge_server.base_url,
+            AZURE_OPENAI_API_KEY="stub",
+            AZURE_OPENAI_API_VERSION="2024-06-01",
+            AZURE_OPENAI_DEPLOYMENT_NAME="stub-judge",
+            TRIAGE_RATE_LIMIT="1000",
+            JUDGE_RATE_LIMIT="1000",
+            EVAL_INDEX_PATH=os.path.join(tempfile.mkdtemp(prefix="bench_startup_"), "index.sqlite3"),
+        )
+        results["run_one_scenario"] = time_command(
+            ["-m", "pytest", "-q", "-p", "no:cacheprovider", "--no-judge-cache", "--telemetry-jsonl", "", ONE_SCENARIO],
+            run_env, args.repeat,
+        )
+
+    write_results({"benchmark": "startup", "scenario": ONE_SCENARIO, "steps": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
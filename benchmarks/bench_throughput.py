@@ -0,0 +1,89 @@
+"""
+Harness throughput benchmark against the local triage and judge stand-ins.
+
+Runs the selected categories through the ScenarioRunner at each concurrency
+level and reports scenarios/minute and judge calls/second. With zero stub
+latency this measures the harness's own overhead; with latency and stub rate
+limits it shows how concurrency and the adaptive limiters behave. With
+--judge-deployments N the judge calls are spread over N stub deployments, each
+with its own --judge-rate-limit, as with a pool of Azure deployments.
+
+    python -m benchmarks.bench_throughput --categories tierA mismatches --concurrency 1 4 8 \
+        --judge-latency lognormal:0,0.3 --output bench_throughput.json
+"""
+import argparse
+import time
+from benchmarks.common import CATEGORIES, load_batch, make_runner, stub_backends, write_results
+from src.triage_client import get_single_flight
+
+
+def run_level(model, triage_stub, judge_stub, categories: list, concurrency: int) -> dict:
+    runner = make_runner(model, concurrency)
+    triage_before = dict(triage_stub.stats)
+    judge_before = dict(judge_stub.stats)
+    scenario_count = 0
+    failed = 0
+
+    start = time.perf_counter()
+    # All selected categories go through the runner as one batch, as in a pytest run
+    batch = load_batch(categories)
+    for category, scenario in batch:
+        result = runner.result_for(category, scenario, batch)
+        scenario_count += 1
+        failed += result.test_failed
+    elapsed = time.perf_counter() - start
+    runner.close()
+
+    judge_calls = judge_stub.stats["completions"] - judge_before["completions"]
+    return {
+        "concurrency": concurrency,
+        "scenarios": scenario_count,
+        "failed_scenarios": failed,
+        "wall_seconds": round(elapsed, 3),
+        "scenarios_per_minute": round(scenario_count / elapsed * 60, 2),
+        "judge_calls": judge_calls,
+        "judge_calls_per_second": round(judge_calls / elapsed, 2),
+        "judge_prompt_tokens": judge_stub.stats["prompt_tokens"] - judge_before["prompt_tokens"],
+        "judge_cached_tokens": judge_stub.stats["cached_tokens"] - judge_before["cached_tokens"],
+        "triage_calls": triage_stub.stats["requests"] - triage_before["requests"],
+        "triage_dedup": get_single_flight().stats() if get_single_flight() else None,
+        "triage_throttled": triage_stub.stats["throttled"] - triage_before["throttled"],
+        "judge_throttled": judge_stub.stats["throttled"] - judge_before["throttled"],
+        "judge_pool": model.pool.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", nargs="+", default=["tierA", "mismatches"], choices=sorted(CATEGORIES))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--triage-latency", default="0")
+    parser.add_argument("--judge-latency", default="0")
+    parser.add_argument("--triage-rate-limit", type=float, default=0.0, help="Stand-in limit, requests/second.")
+    parser.add_argument("--judge-rate-limit", type=float, default=0.0, help="Stand-in limit, requests/second.")
+    parser.add_argument("--judge-deployments", type=int, default=1, help="Stub deployments in the judge pool.")
+    parser.add_argument("--client-rate", type=float, default=1000.0, help="Starting rate of the harness limiters.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    levels = []
+    for concurrency in args.concurrency:
+        # Fresh stand-ins and limiters per level so levels do not influence each other
+        with stub_backends(args.triage_latency, args.judge_latency, args.triage_rate_limit,
+                           args.judge_rate_limit, args.client_rate, args.seed,
+                           args.judge_deployments) as (triage_stub, judge_stub, model):
+            levels.append(run_level(model, triage_stub, judge_stub, args.categories, concurrency))
+
+    write_results({
+        "benchmark": "throughput",
+        "categories": args.categories,
+        "triage_latency": args.triage_latency,
+        "judge_latency": args.judge_latency,
+        "judge_deployments": args.judge_deployments,
+        "levels": levels,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import functools
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Benchmarks never use the real services, so keep deepeval from phoning home
+os.environ.setdefault("DEEPEVAL_TELEMETRY_OPT_OUT", "YES")
+
+import src.test_azure as test_azure
+from src.engine import EvaluationEngine, load_categories, load_scenarios
+from src.judge_usage import reset_judge_usage
+from src.judge_pool import build_pool
+from src.rate_limiter import reset_rate_limiters
+from src.runner import ScenarioRunner
+from src.stubs.common import Latency, ServerRateLimit
+from src.stubs.judge_server import JudgeStub, start_judge_stub
+from src.triage_client import reset_single_flight
+from src.stubs.triage_server import TriageStub, TRIAGE_PATH, load_recordings, start_triage_stub
+from src.test_azure import AzureOpenAIModel
+from tests.conftest import a_create_deepeval_test_case
+
+
+#---- Shared setup for the harness benchmarks ------
+
+# Category definitions (manifest + metrics), as used by the test suite
+CATEGORIES = load_categories()
+
+
+def load_batch(categories: list) -> list[tuple]:
+    """The (category, scenario) pairs of the given categories, for one runner batch."""
+    return load_scenarios({name: CATEGORIES[name] for name in categories})
+
+
+@contextmanager
+def stub_backends(triage_latency: str = "0", judge_latency: str = "0", triage_rate_limit: float = 0.0,
+                  judge_rate_limit: float = 0.0, client_rate: float = 1000.0, seed: int = 0, judge_deployments: int = 1):
+    """
+    Starts the triage and judge stand-ins and points the harness at them.
+    Yields (triage_stub, judge_stub, model). The triage response cache is off
+    and the client rate limiters start at client_rate requests/second.
+    With judge_deployments > 1 the model spreads its calls over that many
+    stub deployments, each with its own judge_rate_limit.
+    """
+    triage_stub = TriageStub(load_recordings(), latency=Latency(triage_latency, seed),
+                             rate_limit=ServerRateLimit(triage_rate_limit), seed=seed)
+    judge_stub = JudgeStub(latency=Latency(judge_latency, seed), rate_limit=ServerRateLimit(judge_rate_limit))
+
+    saved = (test_azure.API_ENDPOINT, test_azure.TRIAGE_CACHE_MODE)
+    for name in ("TRIAGE", "JUDGE"):
+        os.environ[f"{name}_RATE_LIMIT"] = str(client_rate)
+        os.environ[f"{name}_MAX_RATE_LIMIT"] = str(client_rate)
+
+    with start_triage_stub(triage_stub) as triage_server, start_judge_stub(judge_stub) as judge_server:
+        test_azure.API_ENDPOINT = triage_server.base_url + TRIAGE_PATH
+        test_azure.TRIAGE_CACHE_MODE = "off"
+        reset_rate_limiters()
+        reset_judge_usage()
+        reset_single_flight()
+        spec = ",".join(f"stub-judge-{i + 1}" for i in range(judge_deployments)) if judge_deployments > 1 else None
+        pool = build_pool("stub", judge_server.base_url, "2024-06-01", "stub-judge", spec)
+        model = AzureOpenAIModel("stub", judge_server.base_url, "2024-06-01", "stub-judge", 1.0, pool=pool)
+        try:
+            yield triage_stub, judge_stub, model
+        finally:
+            test_azure.API_ENDPOINT, test_azure.TRIAGE_CACHE_MODE = saved
+            reset_rate_limiters()
+            reset_judge_usage()
+            reset_single_flight()
+
+
+def make_runner(model, max_concurrency: int, output_root: str = None, **options) -> ScenarioRunner:
+    """
+    ScenarioRunner that writes scenario outputs to a temp directory instead of
+    testdata/. options go to ScenarioRunner (e.g. combined=CombinedJudge()).
+    """
+    output_root = output_root or tempfile.mkdtemp(prefix="bench_outputs_")
+    build_test_case = functools.partial(a_create_deepeval_test_case, output_root=output_root)
+    return ScenarioRunner(model, build_test_case, EvaluationEngine(model, CATEGORIES).metrics_for, max_concurrency,
+                          **options)
+
+
+def write_results(results: dict, output_path: str = None):
+    """Prints the results and, if asked, saves them as JSON for comparing commits."""
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output_path:
+        with open(output_path, "w") as f:
+            f.write(text)
@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+from src.retrieval import select_retrieval_context
+from src.telemetry import metric_scope
+
+
+#---- Combined multi-metric judge ------
+#
+# GEval sends one prompt per metric, each repeating the scenario's input,
+# output and retrieval context. With --judge-combined the metrics of a scenario
+# are scored in one chat completion instead: the shared fields once, then every
+# metric's evaluation steps, with a JSON schema (structured output) asking for
+# a score and reason per metric name. Scores use GEval's 0-10 scale and are
+# normalised the same way, so thresholds and the Allure report are unchanged.
+#
+# A metric missing from the answer (or a call that fails) is measured the
+# usual way, one GEval prompt per metric.
+
+# Score scale of the combined prompt (GEval's default rubric range)
+SCORE_RANGE = (0, 10)
+
+PROMPT_HEADER = (
+    "You are an evaluator. Score the test case against each of the metrics listed. "
+    "Judge every metric on its own, following only its evaluation steps and looking only at the "
+    "fields it names.\n\n"
+)
+
+PROMPT_FOOTER = (
+    "Return a JSON object with one entry per metric name. Each entry has a \"score\" from "
+    f"{SCORE_RANGE[0]} to {SCORE_RANGE[1]} ({SCORE_RANGE[1]} = the evaluation steps are fully met, "
+    f"{SCORE_RANGE[0]} = not at all) and a concise \"reason\" that refers to specific details of the test case."
+)
+
+
+def _field_value(test_case, param, metric_name: str):
+    if param.value == "retrieval_context":
+        return select_retrieval_context(metric_name, test_case) if test_case.retrieval_context is not None else None
+    return getattr(test_case, param.value)
+
+
+def build_prompt(metrics: list, test_case) -> str:
+    """
+    The single prompt for all of a scenario's metrics: the shared fields once
+    and each metric's steps. With the "prefix" layout (src/judge_prompts.py)
+    the steps come first and the retrieval context before the other fields.
+    """
+    from deepeval.metrics.g_eval.utils import G_EVAL_PARAMS
+    from src.judge_prompts import DEFAULT_PROMPT_LAYOUT, stable_first
+
+    # Each field once, in the order the metrics name them; retrieval context is the
+    # union of what each metric would get on its own (see src/retrieval.py)
+    fields = {}
+    for metric in metrics:
+        for param in metric.evaluation_params:
+            value = _field_value(test_case, param, metric.name)
+            if param.value == "retrieval_context":
+                merged = fields.setdefault(param, [])
+                merged += [chunk for chunk in value or [] if chunk not in merged]
+            else:
+                fields.setdefault(param, value)
+
+    test_case_text = ""
+    prefix_layout = os.environ.get("JUDGE_PROMPT_LAYOUT", DEFAULT_PROMPT_LAYOUT) == "prefix"
+    for param in stable_first(list(fields)) if prefix_layout else fields:
+        value = fields[param]
+        if isinstance(value, list):
+            value = "\n\n".join(value)
+        test_case_text += f"{G_EVAL_PARAMS.get(param, param.value)}:\n{value}\n\n"
+
+    metrics_text = ""
+    for metric in metrics:
+        names = ", ".join(G_EVAL_PARAMS.get(param, param.value) for param in metric.evaluation_params)
+        steps = "\n".join(f"{i}. {step}" for i, step in enumerate(metric.evaluation_steps, 1))
+        metrics_text += f'Metric "{metric.name}" (fields: {names})\nEvaluation steps:\n{steps}\n\n'
+
+    if prefix_layout:
+        return f"{PROMPT_HEADER}{metrics_text}{PROMPT_FOOTER}\n\n---\nTest Case:\n{test_case_text.rstrip()}"
+    return PROMPT_HEADER + test_case_text + metrics_text + PROMPT_FOOTER
+
+
+def response_format(metrics: list) -> dict:
+    """Structured output schema: {metric name: {"score": int, "reason": str}} for every metric."""
+    entry = {
+        "type": "object",
+        "properties": {"score": {"type": "integer"}, "reason": {"type": "string"}},
+        "required": ["score", "reason"],
+        "additionalProperties": False,
+    }
+    names = [metric.name for metric in metrics]
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "metric_scores",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {name: entry for name in names},
+                "required": names,
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+class CombinedJudge:
+    """Scores all of a scenario's metrics with one judge call (see the notes above)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"scenarios": 0, "metrics": 0, "fallbacks": 0}
+
+    async def measure(self, metrics: list, test_case, measure_metrics) -> dict:
+        """Results per metric name, like measure_metrics (src/runner.py)."""
+        # The metrics' own judge, so a cheap tier (src/escalation.py) stays on its deployment
+        model = metrics[0].model
+        scores = {}
+        error = None
+        try:
+            with metric_scope(" + ".join(metric.name for metric in metrics)):
+                content = await model.a_generate_json(build_prompt(metrics, test_case), response_format(metrics))
+            scores = json.loads(content)
+        except Exception as e:
+            error = e
+
+        results = {}
+        missing = []
+        for metric in metrics:
+            entry = scores.get(metric.name) if isinstance(scores, dict) else None
+            if not isinstance(entry, dict) or not isinstance(entry.get("score"), (int, float)):
+                missing.append(metric)
+                continue
+            low, high = SCORE_RANGE
+            score = (min(max(entry["score"], low), high) - low) / (high - low)
+            results[metric.name] = {
+                "score": score,
+                "threshold": metric.threshold,
+                "reason": entry.get("reason", ""),
+                # Same rule as GEval.is_successful()
+                "status": "PASS" if score >= metric.threshold else "FAIL",
+            }
+
+        if missing:
+            if error is not None:
+                print(f"\n[Combined Judge] Combined call failed ({error}); measuring the metrics separately.")
+            results.update(await measure_metrics(missing, test_case))
+
+        with self._lock:
+            self._stats["scenarios"] += 1
+            self._stats["metrics"] += len(metrics)
+            self._stats["fallbacks"] += len(missing)
+        # Keep the metrics' order
+        return {metric.name: results[metric.name] for metric in metrics}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,63 @@
+import json
+import os
+
+
+#---- Compact judge payloads ------
+#
+# The scenario input and the triage output are pretty-printed JSON (indent=4),
+# which is what the output files and the Allure attachments show. Every judge
+# prompt repeats both, so the indentation and the fields that say nothing are
+# paid for in tokens on every metric call. Before the judge sees a test case,
+# both are re-serialised as minified, key-sorted JSON without:
+#   - null values and empty strings (e.g. "triage": null, "message": "")
+#   - the triage API's placeholder fields at their defaults (PLACEHOLDER_VALUES)
+# Zeros and empty lists stay: "rentCosts": 0 or "ccjs": [] are facts the
+# metrics judge on. Text that is not JSON (e.g. an error message) is unchanged.
+#
+# Pre-checks, the eval index and Allure keep the pretty form.
+# JUDGE_COMPACT=off sends the pretty form to the judge, as before.
+
+COMPACT_MODES = ("on", "off")
+DEFAULT_COMPACT_MODE = "on"   # JUDGE_COMPACT
+
+# Fields the triage API fills with a default when they mean nothing (record ids
+# before saving, DateTime.MinValue); dropped only when they hold that default
+PLACEHOLDER_VALUES = {
+    "id": 0,
+    "triageId": 0,
+    "createdAt": "0001-01-01T00:00:00",
+}
+
+
+def compact_enabled() -> bool:
+    return os.environ.get("JUDGE_COMPACT", DEFAULT_COMPACT_MODE) == "on"
+
+
+def compact_value(value):
+    """The value without nulls, empty strings and placeholder fields, at any depth."""
+    if isinstance(value, dict):
+        return {
+            key: compact_value(item)
+            for key, item in value.items()
+            if item is not None and item != "" and not (key in PLACEHOLDER_VALUES and item == PLACEHOLDER_VALUES[key])
+        }
+    if isinstance(value, list):
+        return [compact_value(item) for item in value if item is not None]
+    return value
+
+
+def compact_json(text: str) -> str:
+    """Minified, key-sorted JSON of the compacted document; text that is not JSON is returned as is."""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return text
+    return json.dumps(compact_value(data), ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+def compact_test_case(test_case):
+    """A copy of the test case with compact input and actual output, for the judge only."""
+    return test_case.model_copy(update={
+        "input": compact_json(test_case.input),
+        "actual_output": compact_json(test_case.actual_output),
+    })
@@ -0,0 +1,127 @@
+import copy
+import json
+import os
+import threading
+from src.response_cache import canonical_json
+
+
+#---- Data-driven evaluation engine ------
+#
+# Every category is defined in testdata/categories.json:
+#   "metrics":    metric id -> GEval definition (name, evaluation_steps,
+#                 evaluation_params, threshold)
+#   "categories": category name -> {"manifest": <path under testdata/>,
+#                 "metrics": [<metric id> or {"metric": <id>, <overrides>}]}
+# Adding a category is a manifest plus an entry there; no test module needed.
+
+# Category definitions (override in your .env file)
+DEFAULT_CATEGORIES_PATH = "testdata/categories.json"   # EVAL_CATEGORIES
+
+# Manifests and scenario files are relative to this directory
+TESTDATA_DIR = "testdata"
+
+# The GEval fields a metric definition may set
+METRIC_FIELDS = ("name", "evaluation_steps", "evaluation_params", "threshold")
+
+
+def load_manifest(filename: str) -> list[dict]:
+    """Loads the list of scenario metadata from a manifest file (relative to testdata/)."""
+    path = os.path.join(TESTDATA_DIR, filename)
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def resolve_metric(entry, metrics: dict) -> dict:
+    """A category's metric entry (an id, or {"metric": id, ...overrides}) as a full definition."""
+    overrides = {"metric": entry} if isinstance(entry, str) else dict(entry)
+    metric_id = overrides.pop("metric")
+    if metric_id not in metrics:
+        raise ValueError(f"Unknown metric '{metric_id}'; define it under \"metrics\" in the categories file")
+    definition = {**metrics[metric_id], **overrides}
+    unknown = set(definition) - set(METRIC_FIELDS)
+    if unknown:
+        raise ValueError(f"Metric '{metric_id}' has unknown fields {sorted(unknown)}")
+    return definition
+
+
+def load_categories(path: str = None) -> dict:
+    """
+    Reads the categories file (EVAL_CATEGORIES). Returns category name ->
+    {"name", "manifest", "metrics": [resolved metric definitions]}, in file order.
+    """
+    path = path or os.environ.get("EVAL_CATEGORIES", DEFAULT_CATEGORIES_PATH)
+    with open(path, "r") as f:
+        config = json.load(f)
+    return {
+        name: {
+            "name": name,
+            "manifest": category["manifest"],
+            "metrics": [resolve_metric(entry, config["metrics"]) for entry in category["metrics"]],
+        }
+        for name, category in config["categories"].items()
+    }
+
+
+def load_scenarios(categories: dict) -> list[tuple]:
+    """Every (category name, scenario) pair, category by category in manifest order."""
+    return [
+        (name, scenario)
+        for name, category in categories.items()
+        for scenario in load_manifest(category["manifest"])
+    ]
+
+
+def build_metric(definition: dict, model):
+    """
+    A GEval metric for one resolved metric definition, judged by model, with
+    the prompt layout from JUDGE_PROMPT_LAYOUT (see src/judge_prompts.py).
+    """
+    from deepeval.metrics import GEval
+    from deepeval.test_case import LLMTestCaseParams
+    from src.judge_prompts import PrefixCachedGEvalTemplate, DEFAULT_PROMPT_LAYOUT, stable_first
+
+    params = [LLMTestCaseParams(param) for param in definition["evaluation_params"]]
+    layout = {}
+    if os.environ.get("JUDGE_PROMPT_LAYOUT", DEFAULT_PROMPT_LAYOUT) == "prefix":
+        params = stable_first(params)
+        layout["evaluation_template"] = PrefixCachedGEvalTemplate
+    return GEval(
+        name=definition["name"],
+        evaluation_steps=definition["evaluation_steps"],
+        evaluation_params=params,
+        model=model,
+        threshold=definition["threshold"],
+        **layout,
+    )
+
+
+class EvaluationEngine:
+    """
+    Builds each category's metrics from its definitions. A GEval object is built
+    once per session for each distinct definition (shared by the categories that
+    use it); every scenario gets shallow copies, because a GEval keeps the score
+    and reason of its last measurement on itself.
+    """
+
+    def __init__(self, model, categories: dict = None):
+        self.model = model
+        self.categories = categories if categories is not None else load_categories()
+        self._built = {}
+        self._lock = threading.Lock()
+
+    def _metric(self, definition: dict, model):
+        key = (canonical_json(definition), id(model))
+        with self._lock:
+            if key not in self._built:
+                self._built[key] = build_metric(definition, model)
+            return self._built[key]
+
+    def metrics_for(self, category: str, model=None) -> list:
+        """
+        Fresh copies of the category's metrics for one scenario evaluation,
+        judged by model (default: the engine's model).
+        """
+        if category not in self.categories:
+            raise KeyError(f"Unknown category '{category}'; add it to the categories file")
+        model = model or self.model
+        return [copy.copy(self._metric(definition, model)) for definition in self.categories[category]["metrics"]]
@@ -0,0 +1,74 @@
+import threading
+
+
+#---- Tiered judge escalation ------
+#
+# Most metric verdicts are clear-cut (an empty triageFlags list for a Prime
+# applicant scores far above the threshold), so they do not need the strong
+# judge. With escalation on, every metric is first scored on a cheap/fast
+# deployment (AZURE_OPENAI_CHEAP_DEPLOYMENT_NAME), and only scores within
+# `band` of the metric's threshold, or cheap evaluations that errored, are
+# judged again on the strong deployment. The final verdict is the strong one
+# when there is one; both are kept in the metric's result under "tiers".
+
+# Half-width of the score band around the threshold that is re-judged (override with JUDGE_ESCALATION_BAND)
+DEFAULT_BAND = 0.1
+
+
+class JudgeEscalation:
+    """
+    Runs a scenario's metrics cheap-first and escalates the borderline ones.
+    Counts how many strong-judge evaluations that saved.
+    """
+
+    def __init__(self, cheap_model, build_cheap_metrics, band: float = DEFAULT_BAND):
+        # build_cheap_metrics is a callable: category name -> that category's metrics judged by cheap_model
+        self.cheap_model = cheap_model
+        self.build_cheap_metrics = build_cheap_metrics
+        self.band = band
+        self._lock = threading.Lock()
+        self._stats = {"metrics": 0, "escalated": 0}
+
+    def describe(self) -> dict:
+        """The settings that change verdicts, for the scenario fingerprint."""
+        return {"cheap_deployment": self.cheap_model.get_model_name(), "band": self.band}
+
+    def is_borderline(self, outcome: dict) -> bool:
+        if outcome["status"] == "ERROR" or outcome["score"] is None:
+            return True
+        # Rounded so a score exactly band away (0.7 for 0.8 +/- 0.1) counts despite float error
+        return round(abs(outcome["score"] - outcome["threshold"]), 9) <= self.band
+
+    async def measure(self, category: str, metrics: list, test_case, measure_metrics) -> dict:
+        """
+        Results per metric name, like measure_metrics (src/runner.py), plus
+        "escalated" and "tiers" ({"cheap": ..., "strong": ...}).
+        """
+        cheap_results = await measure_metrics(self.build_cheap_metrics(category), test_case)
+        borderline = [metric for metric in metrics if self.is_borderline(cheap_results[metric.name])]
+        strong_results = await measure_metrics(borderline, test_case) if borderline else {}
+
+        with self._lock:
+            self._stats["metrics"] += len(metrics)
+            self._stats["escalated"] += len(borderline)
+
+        results = {}
+        for metric in metrics:
+            cheap = dict(cheap_results[metric.name], deployment=self.cheap_model.get_model_name())
+            tiers = {"cheap": cheap}
+            if metric.name in strong_results:
+                tiers["strong"] = dict(strong_results[metric.name], deployment=metric.model.get_model_name())
+            final = strong_results.get(metric.name, cheap_results[metric.name])
+            results[metric.name] = {**final, "escalated": "strong" in tiers, "tiers": tiers}
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics, escalated = self._stats["metrics"], self._stats["escalated"]
+        return {
+            "metrics": metrics,
+            "escalated": escalated,
+            # Each metric settled by the cheap judge is one strong-judge evaluation not made
+            "strong_calls_saved": metrics - escalated,
+            "saved_rate": (metrics - escalated) / metrics if metrics else 0.0,
+        }
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import src.test_azure as test_azure
+from src.compaction import compact_enabled
+from src.response_cache import canonical_json
+from src.retrieval import CONTEXT_FILES
+
+
+#---- Scenario fingerprints for incremental runs ------
+
+# Index location (override in your .env file)
+DEFAULT_INDEX_PATH = ".eval_index.sqlite3"   # EVAL_INDEX_PATH
+
+# Scenario input files are relative to this directory (as in the manifests)
+TESTDATA_DIR = "testdata"
+
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def file_hash(path: str) -> str:
+    """sha256 of a file's bytes, or "missing"; computed once per process (files do not change mid-run)."""
+    with _file_hashes_lock:
+        if path not in _file_hashes:
+            try:
+                with open(path, "rb") as f:
+                    _file_hashes[path] = hashlib.sha256(f.read()).hexdigest()
+            except FileNotFoundError:
+                _file_hashes[path] = "missing"
+        return _file_hashes[path]
+
+
+def metric_definition(metric) -> dict:
+    """The parts of a metric that decide its verdict: type, name, criteria/steps, parameters, threshold and prompt layout."""
+    params = getattr(metric, "evaluation_params", None) or []
+    return {
+        "type": type(metric).__name__,
+        "template": getattr(getattr(metric, "evaluation_template", None), "__name__", None),
+        "name": getattr(metric, "name", None) or metric.__name__,
+        "criteria": getattr(metric, "criteria", None),
+        "evaluation_steps": getattr(metric, "evaluation_steps", None),
+        "evaluation_params": [getattr(param, "value", str(param)) for param in params],
+        "threshold": getattr(metric, "threshold", None),
+    }
+
+
+def scenario_fingerprint(scenario: dict, metrics: list, environment: dict) -> str:
+    """
+    Hash of everything a scenario's verdict depends on: its input file, its
+    manifest entry (expected output, pre-checks), the metric definitions, the
+    retrieval context files and the environment (endpoint, model versions,
+    judge deployment, retrieval settings). Any change means it must re-run.
+    """
+    material = {
+        "input": file_hash(os.path.join(TESTDATA_DIR, scenario["input_file"])),
+        "scenario": scenario,
+        "metrics": [metric_definition(metric) for metric in metrics],
+        "contexts": {path: file_hash(path) for path in CONTEXT_FILES},
+        "environment": environment,
+    }
+    return hashlib.sha256(canonical_json(material).encode("utf-8")).hexdigest()
+
+
+class EvalIndex:
+    """
+    SQLite store of each scenario's last fingerprint and verdict, keyed by
+    category and scenario name. Shared safely by pytest-xdist workers.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scenario_index ("
+            " key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, verdict TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(category: str, scenario_name: str) -> str:
+        return f"{category}::{scenario_name}"
+
+    def get(self, key: str, fingerprint: str):
+        """The stored verdict if it was recorded for this exact fingerprint, else None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT verdict FROM scenario_index WHERE key = ? AND fingerprint = ?", (key, fingerprint)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, fingerprint: str, verdict: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scenario_index (key, fingerprint, verdict, updated) VALUES (?, ?, ?, ?)",
+                (key, fingerprint, json.dumps(verdict, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def eval_index_from_env() -> EvalIndex:
+    return EvalIndex(os.environ.get("EVAL_INDEX_PATH", DEFAULT_INDEX_PATH))
+
+
+def run_environment(model, escalation=None, sampler=None, combined=None) -> dict:
+    """The settings outside the testdata that change verdicts: endpoints, model versions and harness modes."""
+    environment = {
+        "triage_endpoint": test_azure.API_ENDPOINT,
+        "triage_model_version": test_azure.TRIAGE_MODEL_VERSION,
+        "judge_deployment": getattr(model, "deployment_name", None),
+        "judge_temperature": getattr(model, "temperature", None),
+        "judge_api_version": getattr(model, "api_version", None),
+        "retrieval": [os.environ.get("RETRIEVAL_MODE", "select"), os.environ.get("RETRIEVAL_TOP_K", "")],
+        "prechecks": os.environ.get("PRECHECKS", "on"),
+        "judge_compact": compact_enabled(),
+    }
+    # Judge modes are only added when on, so fingerprints from plain runs stay valid
+    if escalation is not None:
+        environment["judge_escalation"] = escalation.describe()
+    if sampler is not None:
+        environment["judge_samples"] = sampler.describe()
+    if combined is not None:
+        environment["judge_combined"] = True
+    return environment
@@ -0,0 +1,211 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from contextlib import contextmanager
+from openai.types.chat import ChatCompletion
+
+
+#---- Azure OpenAI Batch API mode for judge calls ------
+#
+# For nightly full regressions: instead of one interactive request per GEval
+# prompt, the prompts of a run are collected, written as a JSONL batch file,
+# uploaded and submitted to the Batch API, polled until done, and each result
+# handed back to the metric that asked for it. Batch traffic has its own quota,
+# so it never touches the interactive judge rate limiter.
+#
+# Azure needs a deployment of type Global-Batch (AZURE_OPENAI_BATCH_DEPLOYMENT_NAME).
+# The local judge stand-in (src/stubs/judge_server.py) also serves the Files and
+# Batches endpoints, so this mode can be tried offline.
+
+# Collection and polling (override in your .env file)
+DEFAULT_WINDOW_SECONDS = 60         # JUDGE_BATCH_WINDOW: submit once no new prompt arrived for this long
+DEFAULT_SETTLE_SECONDS = 0.2        # submit this soon after the last producer is done (see producer())
+DEFAULT_MAX_REQUESTS = 10000        # JUDGE_BATCH_MAX_REQUESTS: submit early once this many are queued
+DEFAULT_POLL_SECONDS = 30           # JUDGE_BATCH_POLL_SECONDS: seconds between status checks
+DEFAULT_BATCH_DIR = "reports/judge_batches"   # JUDGE_BATCH_DIR: where the input/output JSONL files are kept
+
+# Batch states after which polling stops
+TERMINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+class JudgeBatchError(RuntimeError):
+    """A batch, or one request in it, did not produce a completion."""
+
+
+class JudgeBatch:
+    """
+    Collects chat completion requests from concurrent coroutines and runs them
+    as Batch API jobs. complete() queues one request and resolves once the job
+    it was submitted in has finished.
+
+    A job is submitted as soon as no producer (a scenario that may still queue
+    prompts, see producer()) is left, when the queue has been idle for
+    window_seconds, or when it holds max_requests.
+    """
+
+    def __init__(self, client, window_seconds: float = DEFAULT_WINDOW_SECONDS, max_requests: int = DEFAULT_MAX_REQUESTS,
+                 poll_seconds: float = DEFAULT_POLL_SECONDS, batch_dir: str = DEFAULT_BATCH_DIR):
+        # client is an AsyncAzureOpenAI (or OpenAI-compatible) client
+        self.client = client
+        self.window_seconds = window_seconds
+        self.max_requests = max_requests
+        self.poll_seconds = poll_seconds
+        self.batch_dir = batch_dir
+        self.stats = {"batches": 0, "requests": 0, "failed_requests": 0}
+        self._pending = []
+        self._last_queued = 0.0
+        self._timer = None
+        self._jobs = set()
+        self._ids = itertools.count(1)
+        self._files = itertools.count(1)
+        self._producers = 0
+
+    @contextmanager
+    def producer(self):
+        """
+        Marks one scenario that may still queue prompts (the runner holds one per
+        scenario until it starts measuring). Call done() on the yielded object
+        once it has queued everything; leaving the block also counts as done.
+        """
+        producer = _Producer(self)
+        self._producers += 1
+        try:
+            yield producer
+        finally:
+            producer.done()
+
+    def _producer_done(self):
+        self._producers -= 1
+        if self._producers == 0 and self._pending and self._timer is None:
+            self._timer = asyncio.get_running_loop().create_task(self._submit_when_idle())
+
+    async def complete(self, body: dict, call: dict = None) -> ChatCompletion:
+        """Queues one /chat/completions request body and returns its completion once its batch is done."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((f"request-{next(self._ids)}", body, future, call))
+        self._last_queued = loop.time()
+        if len(self._pending) >= self.max_requests:
+            self._submit_pending()
+        elif self._timer is None:
+            self._timer = loop.create_task(self._submit_when_idle())
+        return await future
+
+    async def _submit_when_idle(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Once nobody can add prompts, only wait for the metrics already measuring to queue theirs
+            window = DEFAULT_SETTLE_SECONDS if self._producers == 0 else self.window_seconds
+            wait = self._last_queued + window - loop.time()
+            if wait <= 0:
+                break
+            await asyncio.sleep(min(wait, DEFAULT_SETTLE_SECONDS))
+        self._timer = None
+        self._submit_pending()
+
+    def _submit_pending(self):
+        requests, self._pending = self._pending, []
+        if requests:
+            job = asyncio.get_running_loop().create_task(self._run(requests))
+            # Keep a reference so the job is not garbage collected mid-flight
+            self._jobs.add(job)
+            job.add_done_callback(self._jobs.discard)
+
+    async def _run(self, requests: list):
+        try:
+            batch_id, results = await self._submit_and_wait(requests)
+        except Exception as e:
+            for _, _, future, _ in requests:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for custom_id, _, future, call in requests:
+            if call is not None:
+                call["batch_id"] = batch_id
+            result = results.get(custom_id, JudgeBatchError(f"Batch {batch_id} returned no result for {custom_id}"))
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                self.stats["failed_requests"] += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _submit_and_wait(self, requests: list):
+        """Writes and uploads the JSONL file, submits the job and polls it. Returns (batch id, custom_id -> result)."""
+        lines = [
+            json.dumps({"custom_id": custom_id, "method": "POST", "url": "/chat/completions", "body": body}, ensure_ascii=False)
+            for custom_id, body, _, _ in requests
+        ]
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        name = f"judge_batch_{time.strftime('%Y%m%d_%H%M%S')}_{next(self._files):03d}_{len(requests)}.jsonl"
+        os.makedirs(self.batch_dir, exist_ok=True)
+        with open(os.path.join(self.batch_dir, name), "wb") as f:
+            f.write(data)
+
+        uploaded = await self.client.files.create(file=(name, data), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id, endpoint="/chat/completions", completion_window="24h"
+        )
+        self.stats["batches"] += 1
+        self.stats["requests"] += len(requests)
+        print(f"\n[Judge Batch] Submitted {len(requests)} prompts as batch {batch.id} ({name}).")
+
+        while batch.status not in TERMINAL_STATES:
+            await asyncio.sleep(self.poll_seconds)
+            batch = await self.client.batches.retrieve(batch.id)
+
+        if batch.status != "completed":
+            errors = "; ".join(error.message or error.code or "" for error in (batch.errors.data or [])) if batch.errors else ""
+            raise JudgeBatchError(f"Batch {batch.id} ended as '{batch.status}'. {errors}".strip())
+
+        counts = batch.request_counts
+        print(f"\n[Judge Batch] Batch {batch.id} completed"
+              + (f": {counts.completed}/{counts.total} succeeded." if counts else "."))
+
+        results = {}
+        for file_id, suffix in ((batch.output_file_id, "output"), (batch.error_file_id, "errors")):
+            if not file_id:
+                continue
+            content = (await self.client.files.content(file_id)).text
+            with open(os.path.join(self.batch_dir, name.replace(".jsonl", f".{suffix}.jsonl")), "w", encoding="utf-8") as f:
+                f.write(content)
+            for line in filter(None, (l.strip() for l in content.splitlines())):
+                results.update([_parse_result_line(batch.id, json.loads(line))])
+        return batch.id, results
+
+
+class _Producer:
+    def __init__(self, batch: JudgeBatch):
+        self._batch = batch
+        self._done = False
+
+    def done(self):
+        if not self._done:
+            self._done = True
+            self._batch._producer_done()
+
+
+def _parse_result_line(batch_id: str, line: dict) -> tuple:
+    """(custom_id, ChatCompletion or JudgeBatchError) for one line of an output or error file."""
+    response = line.get("response") or {}
+    if response.get("status_code") == 200 and not line.get("error"):
+        return line["custom_id"], ChatCompletion.model_validate(response["body"])
+    error = line.get("error") or (response.get("body") or {}).get("error") or {}
+    message = error.get("message") if isinstance(error, dict) else str(error)
+    return line["custom_id"], JudgeBatchError(
+        f"Batch {batch_id} request {line['custom_id']} failed ({response.get('status_code')}): {message}"
+    )
+
+
+def judge_batch_from_env(client) -> JudgeBatch:
+    return JudgeBatch(
+        client,
+        window_seconds=float(os.environ.get("JUDGE_BATCH_WINDOW", DEFAULT_WINDOW_SECONDS)),
+        max_requests=int(os.environ.get("JUDGE_BATCH_MAX_REQUESTS", DEFAULT_MAX_REQUESTS)),
+        poll_seconds=float(os.environ.get("JUDGE_BATCH_POLL_SECONDS", DEFAULT_POLL_SECONDS)),
+        batch_dir=os.environ.get("JUDGE_BATCH_DIR", DEFAULT_BATCH_DIR),
+    )
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+#---- Judge call memoization ------
+
+# Cache location and size (override in your .env file)
+DEFAULT_CACHE_PATH = ".judge_cache.sqlite3"   # JUDGE_CACHE_PATH
+DEFAULT_MAX_ENTRIES = 5000                    # JUDGE_CACHE_MAX_ENTRIES
+
+
+class JudgeCache:
+    """
+    SQLite store of judge completions keyed by prompt hash, deployment name,
+    temperature and API version.
+
+    Any object with the same key/get/put methods can be passed to
+    AzureOpenAIModel instead. Entries past max_entries are evicted least
+    recently used first.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Shared by the sync and async code paths (and the runner's worker threads)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS judge_cache ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(prompt: str, deployment_name: str, temperature: float, api_version: str) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{prompt_hash}|{deployment_name}|{temperature}|{api_version}"
+
+    def get(self, key: str):
+        """Returns the cached completion for a key, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM judge_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE judge_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO judge_cache (key, response, last_used) VALUES (?, ?, ?)",
+                (key, response, time.time()),
+            )
+            # Keep only the max_entries most recently used rows
+            self._conn.execute(
+                "DELETE FROM judge_cache WHERE key NOT IN"
+                " (SELECT key FROM judge_cache ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def judge_cache_from_env() -> JudgeCache:
+    """Builds the judge cache from JUDGE_CACHE_PATH / JUDGE_CACHE_MAX_ENTRIES."""
+    return JudgeCache(
+        path=os.environ.get("JUDGE_CACHE_PATH", DEFAULT_CACHE_PATH),
+        max_entries=int(os.environ.get("JUDGE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+    )
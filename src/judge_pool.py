@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from openai import AzureOpenAI, AsyncAzureOpenAI
+from src.rate_limiter import get_rate_limiter
+
+
+#---- Pool of judge deployments ------
+#
+# One Azure OpenAI deployment caps judge throughput at its TPM/RPM quota. With
+# AZURE_OPENAI_DEPLOYMENTS set, AzureOpenAIModel spreads its calls over several
+# deployments (same model, other regions/resources), each with its own client
+# and rate limiter. A deployment that answers 429 is ejected for a while and
+# its calls go to the others. Deployments should all serve the same model:
+# the judge cache and the eval index treat them as one.
+#
+# AZURE_OPENAI_DEPLOYMENTS is either a comma-separated list of deployment names
+# on AZURE_OPENAI_ENDPOINT, or a JSON list such as
+#   [{"deployment": "gpt-4o", "endpoint": "https://a.openai.azure.com", "api_key": "...", "weight": 2},
+#    {"deployment": "gpt-4o", "endpoint": "https://b.openai.azure.com", "api_key": "..."}]
+# where endpoint, api_key and api_version default to the AZURE_OPENAI_* values.
+
+# Pick strategy (override with JUDGE_POOL_STRATEGY):
+#   "least_outstanding" the deployment with the fewest in-flight calls per unit of weight
+#   "round_robin"       smooth weighted round robin
+POOL_STRATEGIES = ("least_outstanding", "round_robin")
+DEFAULT_STRATEGY = "least_outstanding"
+
+# How long a deployment that returned 429 is left out when the server gave no Retry-After (JUDGE_POOL_EJECT_SECONDS)
+DEFAULT_EJECT_SECONDS = 10.0
+
+
+class JudgeDeployment:
+    """One deployment of the judge model: its clients, rate limiter and pool bookkeeping."""
+
+    def __init__(self, deployment_name: str, endpoint: str, api_key: str, api_version: str, weight: float = 1.0,
+                 limiter_name: str = "judge"):
+        self.deployment_name = deployment_name
+        self.endpoint = endpoint
+        self.weight = weight
+        # Retries on 429 are done by AzureOpenAIModel so the rate limiter and the pool learn from them
+        self.sync_client = AzureOpenAI(api_key=api_key, api_version=api_version, azure_endpoint=endpoint, max_retries=0)
+        self.async_client = AsyncAzureOpenAI(api_key=api_key, api_version=api_version, azure_endpoint=endpoint, max_retries=0)
+        self.limiter_name = limiter_name
+        self.outstanding = 0
+        self.ejected_until = 0.0
+        self.current_weight = 0.0   # smooth weighted round robin state
+        self.stats = {"calls": 0, "throttled": 0, "ejections": 0}
+
+    @property
+    def limiter(self):
+        return get_rate_limiter(self.limiter_name)
+
+    @property
+    def label(self) -> str:
+        return f"{self.deployment_name}@{self.endpoint}"
+
+
+class DeploymentPool:
+    """Picks a deployment for each judge call and ejects deployments that are rate limiting."""
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, deployments: list, strategy: str = DEFAULT_STRATEGY, eject_seconds: float = DEFAULT_EJECT_SECONDS):
+        if not deployments:
+            raise ValueError("A judge deployment pool needs at least one deployment")
+        if strategy not in POOL_STRATEGIES:
+            raise ValueError(f"Unknown pool strategy '{strategy}', expected one of {POOL_STRATEGIES}")
+        self.deployments = deployments
+        self.strategy = strategy
+        self.eject_seconds = eject_seconds
+        self._turn = -1
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> JudgeDeployment:
+        return self.deployments[0]
+
+    def _pick(self) -> JudgeDeployment:
+        now = self.clock()
+        available = [d for d in self.deployments if d.ejected_until <= now]
+        if not available:
+            # Everything is ejected: use the one that comes back first (its limiter makes it wait)
+            return min(self.deployments, key=lambda d: d.ejected_until)
+        if len(available) == 1:
+            return available[0]
+        if self.strategy == "least_outstanding":
+            # Ties rotate, so a run with one call in flight still uses every deployment
+            self._turn = (self._turn + 1) % len(available)
+            rotated = available[self._turn:] + available[:self._turn]
+            return min(rotated, key=lambda d: (d.outstanding + 1) / d.weight)
+        # Smooth weighted round robin (as in nginx): even spread, proportional to weight
+        total = sum(d.weight for d in available)
+        for d in available:
+            d.current_weight += d.weight
+        chosen = max(available, key=lambda d: d.current_weight)
+        chosen.current_weight -= total
+        return chosen
+
+    @contextmanager
+    def use(self, pinned: JudgeDeployment = None):
+        """
+        Picks a deployment (or uses pinned) and counts the call as outstanding
+        on it until the block ends.
+        """
+        with self._lock:
+            deployment = pinned or self._pick()
+            deployment.outstanding += 1
+            deployment.stats["calls"] += 1
+        try:
+            yield deployment
+        finally:
+            with self._lock:
+                deployment.outstanding -= 1
+
+    def eject(self, deployment: JudgeDeployment, retry_after: float = None):
+        """Leaves a deployment that returned 429 out of the pool for retry_after (or eject_seconds) seconds."""
+        with self._lock:
+            deployment.stats["throttled"] += 1
+            if len(self.deployments) == 1:
+                return
+            until = self.clock() + (retry_after or self.eject_seconds)
+            if deployment.ejected_until <= self.clock():
+                deployment.stats["ejections"] += 1
+                print(f"\n[Judge Pool] Ejecting {deployment.label} for {until - self.clock():.0f}s after a 429.")
+            deployment.ejected_until = max(deployment.ejected_until, until)
+
+    def summary(self) -> list[dict]:
+        with self._lock:
+            return [{"deployment": d.label, "weight": d.weight, **d.stats} for d in self.deployments]
+
+
+def parse_deployments(spec: str) -> list[dict]:
+    """Parses AZURE_OPENAI_DEPLOYMENTS (a JSON list of objects, or comma-separated deployment names)."""
+    spec = (spec or "").strip()
+    if spec.startswith("["):
+        return json.loads(spec)
+    return [{"deployment": name.strip()} for name in spec.split(",") if name.strip()]
+
+
+def build_pool(api_key: str, endpoint: str, api_version: str, deployment_name: str, spec: str = None,
+               limiter: str = "judge") -> DeploymentPool:
+    """
+    The pool for AzureOpenAIModel: the deployments in spec (AZURE_OPENAI_DEPLOYMENTS
+    format), or just deployment_name on endpoint when spec is empty. Rate
+    limiters are named after limiter ("judge", or e.g. "judge:cheap" for a
+    second model with its own quota).
+    """
+    entries = parse_deployments(spec) or [{"deployment": deployment_name}]
+    pooled = len(entries) > 1
+    deployments = []
+    for i, entry in enumerate(entries):
+        deployments.append(JudgeDeployment(
+            entry.get("deployment", deployment_name),
+            entry.get("endpoint", endpoint),
+            entry.get("api_key", api_key),
+            entry.get("api_version", api_version),
+            weight=float(entry.get("weight", 1.0)),
+            # Each deployment has its own quota, so its own limiter (a single deployment keeps "judge")
+            limiter_name=f"{limiter}:{i + 1}" if pooled else limiter,
+        ))
+    return DeploymentPool(
+        deployments,
+        strategy=os.environ.get("JUDGE_POOL_STRATEGY", DEFAULT_STRATEGY),
+        eject_seconds=float(os.environ.get("JUDGE_POOL_EJECT_SECONDS", DEFAULT_EJECT_SECONDS)),
+    )
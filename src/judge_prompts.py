@@ -0,0 +1,55 @@
+from deepeval.metrics import GEvalTemplate
+
+
+#---- Prefix-cache-friendly judge prompts ------
+#
+# Azure OpenAI caches the longest previously seen prompt prefix (from 1,024
+# tokens, in 128-token steps) and bills those tokens at a discount, with lower
+# latency. deepeval's GEval prompt puts the test case (input first) in the
+# middle, so nothing after the instructions and steps is ever shared between
+# scenarios. This layout keeps everything that is the same for every scenario
+# of a metric in front: instructions, evaluation steps, parameters, the JSON
+# example, then the retrieval context (identical across scenarios for "full"
+# context metrics, see src/retrieval.py), and only then input and outputs.
+#
+# JUDGE_PROMPT_LAYOUT=deepeval switches back to deepeval's own layout.
+
+PROMPT_LAYOUTS = ("prefix", "deepeval")
+DEFAULT_PROMPT_LAYOUT = "prefix"
+
+# Test case fields that are the same across scenarios go first (in this order)
+STABLE_PARAMS = ("context", "retrieval_context")
+
+_SLOT = "\x00TEST_CASE\x00"
+_ANSWER_CUE = "JSON:"
+_TEST_CASE_LABEL = "Test Case:\n"
+
+
+def stable_first(evaluation_params: list) -> list:
+    """The metric's parameters with the scenario-independent ones first (test case fields render in this order)."""
+    def rank(param):
+        value = getattr(param, "value", param)
+        return STABLE_PARAMS.index(value) if value in STABLE_PARAMS else len(STABLE_PARAMS)
+    return sorted(evaluation_params, key=rank)
+
+
+class PrefixCachedGEvalTemplate(GEvalTemplate):
+    """
+    GEval's own wording, rearranged: deepeval's prompt is rendered around a
+    placeholder and the test case moved to the end, just before the answer cue.
+    """
+
+    @staticmethod
+    def generate_evaluation_results(**kwargs) -> str:
+        default = GEvalTemplate.generate_evaluation_results(**kwargs)
+        rendered = GEvalTemplate.generate_evaluation_results(**{**kwargs, "test_case_content": _SLOT})
+        head, found, tail = rendered.partition(_SLOT)
+        instructions, cue, _ = tail.rpartition(_ANSWER_CUE)
+        if not found or not cue or not head.endswith(_TEST_CASE_LABEL):
+            # A deepeval version with another prompt shape: keep its layout
+            return default
+        head = head[:-len(_TEST_CASE_LABEL)]
+        return (
+            f"{head.rstrip()}\n\n{instructions.strip()}\n\n---\n"
+            f"{_TEST_CASE_LABEL}{kwargs['test_case_content'].rstrip()}\n\n{_ANSWER_CUE}"
+        )
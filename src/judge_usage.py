@@ -0,0 +1,283 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+
+#---- Judge token and cost accounting ------
+
+# USD per 1K prompt/completion tokens for deployments not listed in JUDGE_PRICES
+# (Azure OpenAI gpt-4o list price; set JUDGE_PRICES to match your deployments)
+DEFAULT_PRICE_PER_1K = (0.0025, 0.01)
+
+# Share of the prompt price paid for prompt tokens served from Azure's prompt
+# cache (see src/judge_prompts.py); override with JUDGE_CACHED_PRICE_FACTOR
+DEFAULT_CACHED_PRICE_FACTOR = 0.5
+
+# What to do once a budget is used up: "stop" skips the scenarios that have not
+# started yet, "downgrade" switches the judge to AZURE_OPENAI_FALLBACK_DEPLOYMENT_NAME
+BUDGET_ACTIONS = ("stop", "downgrade")
+
+# Run-wide spend shared by pytest-xdist workers (override in your .env file)
+DEFAULT_SPEND_STATE_PATH = ".judge_spend.sqlite3"   # JUDGE_SPEND_STATE_PATH
+
+# Estimate for a request whose usage is not known yet (Batch API prompts, see reserve())
+ESTIMATED_CHARS_PER_TOKEN = 4
+ESTIMATED_COMPLETION_TOKENS = 100
+
+
+class JudgeBudgetExhausted(RuntimeError):
+    """A judge request was refused because the run's token/cost budget is spent."""
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // ESTIMATED_CHARS_PER_TOKEN)
+
+
+def parse_prices(spec: str) -> dict:
+    """
+    Parses JUDGE_PRICES, e.g. "gpt-4o=0.0025/0.01,gpt-4o-mini=0.00015/0.0006"
+    (deployment=prompt/completion USD per 1K tokens).
+    """
+    prices = {}
+    for entry in filter(None, (part.strip() for part in (spec or "").split(","))):
+        deployment, _, price = entry.partition("=")
+        prompt_price, _, completion_price = price.partition("/")
+        prices[deployment.strip()] = (float(prompt_price), float(completion_price))
+    return prices
+
+
+class SharedSpend:
+    """
+    Tokens and cost spent by every process of a run, in a SQLite file, so the
+    pytest-xdist workers check one run-wide budget (as SharedRateLimiter in
+    src/rate_limiter.py shares one rate). Each update is a BEGIN IMMEDIATE
+    transaction, which SQLite serialises across processes.
+    """
+
+    def __init__(self, path: str = DEFAULT_SPEND_STATE_PATH, run_id: str = "default"):
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS spend (run_id TEXT PRIMARY KEY, tokens INTEGER, cost REAL, updated REAL)"
+            )
+            # Forget runs that finished more than a day ago
+            self._conn.execute("DELETE FROM spend WHERE updated < ?", (time.time() - 86400,))
+            self._conn.execute("INSERT OR IGNORE INTO spend VALUES (?, 0, 0.0, ?)", (run_id, time.time()))
+            self._conn.execute("COMMIT")
+
+    def add(self, tokens: int, cost: float):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE spend SET tokens = tokens + ?, cost = cost + ?, updated = ? WHERE run_id = ?",
+                (tokens, cost, time.time(), self.run_id),
+            )
+
+    def totals(self) -> tuple:
+        """(tokens, cost) spent by the whole run so far."""
+        with self._lock:
+            return self._conn.execute("SELECT tokens, cost FROM spend WHERE run_id = ?", (self.run_id,)).fetchone()
+
+
+class JudgeUsage:
+    """
+    Accumulates judge calls and tokens per (category, metric, deployment) and
+    checks them against an optional token and/or cost budget for the run.
+
+    With a SharedSpend (pytest-xdist workers) the budget is checked against
+    what all workers spent together. Requests whose usage is not known yet
+    (Batch API prompts) reserve an estimate until their result arrives.
+    """
+
+    def __init__(self, prices: dict = None, token_budget: int = None, cost_budget: float = None, action: str = "stop",
+                 cached_price_factor: float = DEFAULT_CACHED_PRICE_FACTOR, shared: SharedSpend = None):
+        if action not in BUDGET_ACTIONS:
+            raise ValueError(f"Unknown budget action '{action}', expected one of {BUDGET_ACTIONS}")
+        self.prices = prices or {}
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.action = action
+        self.cached_price_factor = cached_price_factor
+        # (category, metric, deployment) -> {"calls", "cached", "prompt_tokens", "cached_tokens", "completion_tokens"}
+        # ("cached" counts calls answered by the local response cache, "cached_tokens" the
+        # prompt tokens Azure served from its prompt cache)
+        self.rows = defaultdict(lambda: {"calls": 0, "cached": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0})
+        self.shared = shared
+        # Estimated tokens and cost of the requests still waiting for their usage
+        self._reserved = [0, 0.0]
+        self._lock = threading.Lock()
+        self._announced = False
+
+    def price(self, deployment: str) -> tuple:
+        return self.prices.get(deployment, DEFAULT_PRICE_PER_1K)
+
+    def cost(self, deployment: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+        prompt_price, completion_price = self.price(deployment)
+        prompt_cost = (prompt_tokens - cached_tokens + cached_tokens * self.cached_price_factor) * prompt_price
+        return (prompt_cost + completion_tokens * completion_price) / 1000
+
+    def add(self, category: str, metric: str, deployment: str, prompt_tokens: int = 0, completion_tokens: int = 0, cached: bool = False,
+            cached_tokens: int = 0):
+        """Records one judge call (cached calls count, but cost nothing)."""
+        with self._lock:
+            row = self.rows[(category or "-", metric or "-", deployment)]
+            row["calls"] += 1
+            row["cached"] += cached
+            row["prompt_tokens"] += prompt_tokens
+            row["cached_tokens"] += cached_tokens
+            row["completion_tokens"] += completion_tokens
+        # Only written while a budget needs the run-wide figure
+        if self.shared is not None and (self.token_budget is not None or self.cost_budget is not None):
+            self.shared.add(prompt_tokens + completion_tokens,
+                            self.cost(deployment, prompt_tokens, completion_tokens, cached_tokens))
+
+    def reserve(self, deployment: str, prompt: str) -> tuple:
+        """Counts a request's estimated tokens and cost towards the budget until release()."""
+        prompt_tokens = estimate_tokens(prompt)
+        reservation = (prompt_tokens + ESTIMATED_COMPLETION_TOKENS,
+                       self.cost(deployment, prompt_tokens, ESTIMATED_COMPLETION_TOKENS))
+        with self._lock:
+            self._reserved[0] += reservation[0]
+            self._reserved[1] += reservation[1]
+        return reservation
+
+    def release(self, reservation: tuple):
+        with self._lock:
+            self._reserved[0] -= reservation[0]
+            self._reserved[1] -= reservation[1]
+
+    def spent(self) -> tuple:
+        """(tokens, cost) the budget is checked against: the run's spend plus open reservations."""
+        if self.shared is not None:
+            tokens, cost = self.shared.totals()
+        else:
+            totals = self.totals()
+            tokens, cost = totals["tokens"], totals["cost"]
+        with self._lock:
+            return tokens + self._reserved[0], cost + self._reserved[1]
+
+    def merge(self, rows: list):
+        """Adds rows produced by as_rows() in another process (e.g. a pytest-xdist worker)."""
+        with self._lock:
+            for row in rows:
+                target = self.rows[(row["category"], row["metric"], row["deployment"])]
+                for field in ("calls", "cached", "prompt_tokens", "cached_tokens", "completion_tokens"):
+                    target[field] += row.get(field, 0)
+
+    def totals(self) -> dict:
+        with self._lock:
+            rows = list(self.rows.items())
+        totals = {"calls": 0, "cached": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "cost": 0.0}
+        for (_, _, deployment), row in rows:
+            for field in ("calls", "cached", "prompt_tokens", "cached_tokens", "completion_tokens"):
+                totals[field] += row[field]
+            totals["cost"] += self.cost(deployment, row["prompt_tokens"], row["completion_tokens"], row["cached_tokens"])
+        totals["tokens"] = totals["prompt_tokens"] + totals["completion_tokens"]
+        return totals
+
+    def over_budget(self) -> bool:
+        if self.token_budget is None and self.cost_budget is None:
+            return False
+        tokens, cost = self.spent()
+        over = (
+            (self.token_budget is not None and tokens >= self.token_budget)
+            or (self.cost_budget is not None and cost >= self.cost_budget)
+        )
+        if over and not self._announced:
+            self._announced = True
+            print(f"\n[Judge Budget] Used {tokens} tokens / ${cost:.4f}; budget reached ({self.action}).")
+        return over
+
+    def as_rows(self) -> list[dict]:
+        with self._lock:
+            rows = list(self.rows.items())
+        return [
+            {
+                "category": category,
+                "metric": metric,
+                "deployment": deployment,
+                **row,
+                "cost": round(self.cost(deployment, row["prompt_tokens"], row["completion_tokens"], row["cached_tokens"]), 6),
+            }
+            for (category, metric, deployment), row in sorted(rows)
+        ]
+
+    def summary_lines(self) -> list[str]:
+        """Plain-text table of usage per category and metric, with per-category and run totals."""
+        header = (f"{'category':<18} {'metric':<34} {'deployment':<16} {'calls':>6} {'cached':>6} {'prompt tok':>11}"
+                  f" {'cached tok':>10} {'compl tok':>10} {'cost $':>9}")
+        lines = [header, "-" * len(header)]
+        by_category = defaultdict(lambda: [0, 0, 0, 0, 0, 0.0])
+        for row in self.as_rows():
+            lines.append(
+                f"{row['category']:<18} {row['metric'][:34]:<34} {row['deployment'][:16]:<16} {row['calls']:>6} {row['cached']:>6}"
+                f" {row['prompt_tokens']:>11} {row['cached_tokens']:>10} {row['completion_tokens']:>10} {row['cost']:>9.4f}"
+            )
+            subtotal = by_category[row["category"]]
+            for i, field in enumerate(("calls", "cached", "prompt_tokens", "cached_tokens", "completion_tokens", "cost")):
+                subtotal[i] += row[field]
+
+        lines.append("-" * len(header))
+        for category, (calls, cached, prompt_tokens, cached_tokens, completion_tokens, cost) in sorted(by_category.items()):
+            lines.append(f"{category:<18} {'(all metrics)':<34} {'':<16} {calls:>6} {cached:>6} {prompt_tokens:>11}"
+                         f" {cached_tokens:>10} {completion_tokens:>10} {cost:>9.4f}")
+
+        totals = self.totals()
+        lines.append(
+            f"{'TOTAL':<18} {'':<34} {'':<16} {totals['calls']:>6} {totals['cached']:>6}"
+            f" {totals['prompt_tokens']:>11} {totals['cached_tokens']:>10} {totals['completion_tokens']:>10} {totals['cost']:>9.4f}"
+        )
+        limits = []
+        if self.token_budget is not None:
+            limits.append(f"{self.token_budget} tokens")
+        if self.cost_budget is not None:
+            limits.append(f"${self.cost_budget:.4f}")
+        if limits:
+            status = "EXCEEDED" if self.over_budget() else "within budget"
+            lines.append(f"Budget: {' / '.join(limits)} ({self.action}): {status}")
+        return lines
+
+
+_usage = None
+_usage_lock = threading.Lock()
+
+
+def get_judge_usage() -> JudgeUsage:
+    """
+    Returns the process-wide judge usage tracker, configured from JUDGE_PRICES,
+    JUDGE_TOKEN_BUDGET, JUDGE_COST_BUDGET, JUDGE_BUDGET_ACTION and
+    JUDGE_CACHED_PRICE_FACTOR. Under pytest-xdist the budget covers the spend
+    of all worker processes of the run.
+    """
+    global _usage
+    with _usage_lock:
+        if _usage is None:
+            token_budget = os.environ.get("JUDGE_TOKEN_BUDGET")
+            cost_budget = os.environ.get("JUDGE_COST_BUDGET")
+            shared = None
+            if os.environ.get("PYTEST_XDIST_WORKER"):
+                shared = SharedSpend(
+                    os.environ.get("JUDGE_SPEND_STATE_PATH", DEFAULT_SPEND_STATE_PATH),
+                    # Set by xdist to the same value in every worker of one run (and a new one per run)
+                    run_id=os.environ["PYTEST_XDIST_TESTRUNUID"],
+                )
+            _usage = JudgeUsage(
+                prices=parse_prices(os.environ.get("JUDGE_PRICES", "")),
+                token_budget=int(token_budget) if token_budget else None,
+                cost_budget=float(cost_budget) if cost_budget else None,
+                action=os.environ.get("JUDGE_BUDGET_ACTION", "stop"),
+                cached_price_factor=float(os.environ.get("JUDGE_CACHED_PRICE_FACTOR", DEFAULT_CACHED_PRICE_FACTOR)),
+                shared=shared,
+            )
+        return _usage
+
+
+def reset_judge_usage():
+    """Forgets the tracker, so the next get_judge_usage() starts from zero with the current env."""
+    global _usage
+    with _usage_lock:
+        _usage = None
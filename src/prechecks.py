@@ -0,0 +1,180 @@
+import json
+import os
+import re
+
+
+#---- Deterministic pre-checks ------
+#
+# Fast local assertions on the triage output, run before any GEval metric.
+# A failed pre-check fails the scenario without calling the judge; a scenario
+# whose manifest entry says its pre-checks decide it ("prechecks_decide": true)
+# also passes without the judge when they all pass. Otherwise the pre-check
+# result is reported next to the metrics. Set PRECHECKS=off to skip them.
+#
+# Rules come from the manifest entry's "prechecks" list, e.g.
+#   "prechecks": [{"rule": "max_severity", "severity": "Low"}], "prechecks_decide": true
+# or, if it has none, are inferred from its expected_output_prompt (INFERRED_RULES).
+
+SEVERITIES = ["Low", "Medium", "High", "Critical"]
+
+# Fields every triage flag must carry (see the ReportFinding tool in testdata/findings.txt)
+FLAG_FIELDS = ["severity", "title", "targetField", "currentValue", "expectedValue", "description", "recommendation", "reasoning"]
+
+# Name of the pre-check entry in a scenario's results
+PRECHECK_RESULT = "Pre-checks"
+
+# Expected output phrases that map onto a mechanical rule. The "mentions" rules
+# only apply when the expectation asks for something to be mentioned/highlighted.
+_ASKS_FOR_MENTION = re.compile(r"\b(mention|mentioned|highlight|highlighted)\b")
+INFERRED_RULES = [
+    (re.compile(r"\bdti\b"), {"rule": "mentions", "any": ["DTI", "debt to income"]}),
+    (re.compile(r"\bltv\b"), {"rule": "mentions", "any": ["LTV", "loan to value"]}),
+    (re.compile(r"\bmileage\b"), {"rule": "mentions", "any": ["mileage"]}),
+    (re.compile(r"\bcredit searches\b"), {"rule": "mentions", "any": ["search"]}),
+    (re.compile(r"\bdeposit\b"), {"rule": "mentions", "any": ["deposit"]}),
+    (re.compile(r"\bpostcode\b"), {"rule": "mentions", "any": ["postcode", "post code"]}),
+    (re.compile(r"\bdate of birth\b"), {"rule": "mentions", "any": ["date of birth", "DOB", "birth"]}),
+    (re.compile(r"\baddress"), {"rule": "mentions", "any": ["address"]}),
+    (re.compile(r"\bfraud\b"), {"rule": "mentions", "any": ["fraud"]}),
+    (re.compile(r"\bdefaults?\b"), {"rule": "mentions", "any": ["default"]}),
+    (re.compile(r"\bcredit utili[sz]ation\b"), {"rule": "mentions", "any": ["utilisation", "utilization"]}),
+    (re.compile(r"^medium risk factor mentioned"), {"rule": "min_severity", "severity": "Medium"}),
+    (re.compile(r"^(no mention of any significant risks, )?all risk factors should be low severity"
+                r"|\bno medium or severe risk factors\b"), {"rule": "max_severity", "severity": "Low"}),
+]
+
+
+class PrecheckError(ValueError):
+    """The triage output is not a valid triage result."""
+
+
+def _normalise(text: str) -> str:
+    # "Debt-to-Income", "debt to income" and "DebtToIncomePercent" all contain "debttoincome"
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def is_error_output(actual_output: str) -> bool:
+    """True for the error payloads get_ai_output_from_api returns when the triage call failed."""
+    try:
+        data = json.loads(actual_output)
+    except (TypeError, ValueError):
+        # "Input Serialization Failed" payloads embed the exception text unescaped
+        return isinstance(actual_output, str) and actual_output.startswith('{"error": ')
+    return isinstance(data, dict) and "error" in data
+
+
+def parse_triage_output(actual_output: str) -> dict:
+    """
+    Validates the triage output against the triage result schema and returns
+    its content ({"triageFlags": [...], "reasoning": ...}). Raises
+    PrecheckError for error payloads and schema violations.
+    """
+    try:
+        data = json.loads(actual_output)
+    except (TypeError, ValueError):
+        raise PrecheckError("Output is not valid JSON")
+    if not isinstance(data, dict):
+        raise PrecheckError("Output is not a JSON object")
+    if "error" in data:
+        # Payloads built by get_ai_output_from_api when the call failed
+        raise PrecheckError(f"Triage API call failed: {data['error']} {data.get('status_code', '')}".strip())
+
+    # The endpoint wraps the result as {"content": ..., "message": ..., "isSuccessStatusCode": ...}
+    if "content" in data:
+        if data.get("isSuccessStatusCode") is not True:
+            raise PrecheckError(f"isSuccessStatusCode is {data.get('isSuccessStatusCode')!r}: {data.get('message', '')}")
+        data = data["content"]
+        if not isinstance(data, dict):
+            raise PrecheckError("'content' is not a JSON object")
+
+    flags = data.get("triageFlags")
+    if not isinstance(flags, list):
+        raise PrecheckError("'triageFlags' is missing or not a list")
+    for i, flag in enumerate(flags):
+        if not isinstance(flag, dict):
+            raise PrecheckError(f"triageFlags[{i}] is not a JSON object")
+        missing = [field for field in FLAG_FIELDS if field not in flag]
+        if missing:
+            raise PrecheckError(f"triageFlags[{i}] is missing {', '.join(missing)}")
+        if flag["severity"] not in SEVERITIES:
+            raise PrecheckError(f"triageFlags[{i}] has unknown severity {flag['severity']!r}")
+    if not isinstance(data.get("reasoning", ""), str):
+        raise PrecheckError("'reasoning' is not a string")
+    return data
+
+
+def rules_for(scenario: dict) -> list[dict]:
+    """The scenario's manifest pre-checks, or the rules inferred from its expected output."""
+    if "prechecks" in scenario:
+        return scenario["prechecks"]
+    expected = scenario.get("expected_output_prompt", "").strip().lower()
+    asks_for_mention = bool(_ASKS_FOR_MENTION.search(expected))
+    return [
+        rule for pattern, rule in INFERRED_RULES
+        if pattern.search(expected) and (rule["rule"] != "mentions" or asks_for_mention)
+    ]
+
+
+def check_rule(rule: dict, content: dict) -> tuple:
+    """Applies one rule to the parsed output. Returns (passed, message)."""
+    flags = content["triageFlags"]
+    severities = [SEVERITIES.index(flag["severity"]) for flag in flags]
+    kind = rule["rule"]
+
+    if kind == "no_flags":
+        return not flags, f"{len(flags)} triage flag(s) raised, expected none"
+
+    if kind == "max_severity":
+        limit = SEVERITIES.index(rule["severity"])
+        worst = max(severities, default=-1)
+        return worst <= limit, f"highest severity {SEVERITIES[worst] if flags else 'none'}, allowed up to {rule['severity']}"
+
+    if kind == "min_severity":
+        floor = SEVERITIES.index(rule["severity"])
+        return any(s >= floor for s in severities), f"needs a flag of at least {rule['severity']} severity"
+
+    if kind == "mentions":
+        text = _normalise(" ".join(
+            [content.get("reasoning") or ""]
+            + [str(flag.get(field) or "") for flag in flags for field in ("title", "targetField", "description", "reasoning")]
+        ))
+        found = [keyword for keyword in rule["any"] if _normalise(keyword) in text]
+        return bool(found), f"mentions one of {rule['any']}"
+
+    raise ValueError(f"Unknown pre-check rule '{kind}'")
+
+
+def run_prechecks(scenario: dict, actual_output: str):
+    """
+    Runs the scenario's pre-checks. Returns (decided, result): decided is True
+    when the judge is not needed, and result is the pre-check entry for the
+    scenario's results (None if there was nothing to check).
+    """
+    if os.environ.get("PRECHECKS", "on") == "off":
+        return False, None
+
+    messages = []
+    try:
+        content = parse_triage_output(actual_output)
+        messages.append("PASS schema: valid triage result")
+    except PrecheckError as e:
+        return True, _result(False, [f"FAIL schema: {e}"])
+
+    passed_all = True
+    for rule in rules_for(scenario):
+        passed, message = check_rule(rule, content)
+        messages.append(f"{'PASS' if passed else 'FAIL'} {rule['rule']}: {message}")
+        passed_all = passed_all and passed
+
+    if not passed_all:
+        return True, _result(False, messages)
+    return bool(scenario.get("prechecks_decide")), _result(True, messages)
+
+
+def _result(passed: bool, messages: list) -> dict:
+    return {
+        "score": 1.0 if passed else 0.0,
+        "threshold": 1.0,
+        "reason": "\n".join(messages),
+        "status": "PASS" if passed else "FAIL",
+    }
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from src.telemetry import record_time
+
+
+#---- Adaptive Rate Limiting ------
+
+# Starting and ceiling request rates (requests/second) per backend.
+# Override with <NAME>_RATE_LIMIT and <NAME>_MAX_RATE_LIMIT, e.g. TRIAGE_RATE_LIMIT=0.5
+DEFAULT_RATES = {
+    "triage": (0.5, 5.0),
+    "judge": (2.0, 20.0),
+}
+MIN_RATE = 0.01  # never slow down below one request every 100 seconds
+
+# Where pytest-xdist workers keep the shared bucket state (override with RATE_LIMIT_STATE_PATH)
+DEFAULT_STATE_PATH = ".rate_limits.sqlite3"
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose refill rate is tuned with AIMD (additive increase,
+    multiplicative decrease).
+
+    Every successful call nudges the rate up by `increase` requests/second;
+    every rate-limit response multiplies it by `decrease` and, if the server
+    said how long to wait (Retry-After / "Please retry after N seconds"),
+    pauses all callers until then. The rate settles just under what the
+    backend can sustain, instead of sleeping a fixed amount after every call.
+    """
+
+    # Clock used for the bucket timestamps
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, name: str, rate: float, max_rate: float, increase: float = None, decrease: float = 0.5, burst: float = 1.0):
+        self.name = name
+        # Telemetry phase prefix: "judge:2" (one deployment of a judge pool) reports as "judge"
+        self.kind = name.split(":")[0]
+        self.rate = rate
+        self.max_rate = max_rate
+        # Default step: reach max_rate from zero in ~50 successful calls
+        self.increase = increase if increase is not None else max_rate / 50
+        self.decrease = decrease
+        self.burst = burst
+        self._tokens = burst
+        self._updated = self.clock()
+        self._blocked_until = 0.0
+        self._generation = 0  # bumped on every rate decrease
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _state(self):
+        """Guards a read-modify-write of the bucket state."""
+        with self._lock:
+            yield
+
+    def _reserve(self):
+        """Takes one token and returns (seconds to wait before using it, current generation)."""
+        with self._state():
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # A negative balance is a queue of callers, each spaced 1/rate apart
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._blocked_until - now), self._generation
+
+    def acquire(self) -> int:
+        """Blocks until the next request may be sent. Returns a ticket to pass to on_throttle."""
+        wait, ticket = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+            record_time(f"{self.kind}_throttle_wait", wait)
+        return ticket
+
+    async def a_acquire(self) -> int:
+        """Async version of acquire; other tasks keep running while this one waits."""
+        wait, ticket = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+            record_time(f"{self.kind}_throttle_wait", wait)
+        return ticket
+
+    def on_success(self):
+        """Additive increase after a request that was not throttled."""
+        with self._state():
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: float = None, ticket: int = None):
+        """
+        Multiplicative decrease after a 429 / RateLimitReached response.
+        ticket is the value acquire() returned for the throttled request:
+        requests scheduled before the last decrease were paced at the old rate,
+        so their throttles belong to the same overload and do not cut the rate again.
+        """
+        with self._state():
+            if ticket is None or ticket >= self._generation:
+                self.rate = max(MIN_RATE, self.rate * self.decrease)
+                self._generation += 1
+                # Drop any saved-up burst so the next callers are spaced at the new rate
+                self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, self.clock() + retry_after)
+        print(f"\n[{self.name} rate limiter] Throttled. New rate: {self.rate:.3f} req/s"
+              + (f", pausing {retry_after}s." if retry_after else "."))
+
+
+class SharedRateLimiter(AdaptiveRateLimiter):
+    """
+    AdaptiveRateLimiter whose bucket lives in a SQLite file, so every process
+    of a run (e.g. all pytest-xdist workers) draws from one global budget per
+    backend and a 429 seen by one worker slows all of them down.
+
+    Each state change is a BEGIN IMMEDIATE transaction, which SQLite serialises
+    across processes on every platform.
+    """
+
+    # Wall-clock time, because monotonic clocks are not comparable between processes
+    clock = staticmethod(time.time)
+
+    def __init__(self, name: str, rate: float, max_rate: float, path: str = DEFAULT_STATE_PATH, run_id: str = "default", **kwargs):
+        super().__init__(name, rate, max_rate, **kwargs)
+        self.key = f"{run_id}:{name}"
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " key TEXT PRIMARY KEY, rate REAL, tokens REAL, updated REAL, blocked_until REAL, generation INTEGER)"
+            )
+            # Forget buckets of runs that finished more than a day ago
+            self._conn.execute("DELETE FROM buckets WHERE updated < ?", (self.clock() - 86400,))
+            # The first worker to start seeds the bucket; the others pick it up
+            self._conn.execute(
+                "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, ?, ?, ?)",
+                (self.key, self.rate, self._tokens, self._updated, self._blocked_until, self._generation),
+            )
+            self._conn.execute("COMMIT")
+
+    @contextmanager
+    def _state(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.rate, self._tokens, self._updated, self._blocked_until, self._generation = self._conn.execute(
+                    "SELECT rate, tokens, updated, blocked_until, generation FROM buckets WHERE key = ?", (self.key,)
+                ).fetchone()
+                yield
+                self._conn.execute(
+                    "UPDATE buckets SET rate = ?, tokens = ?, updated = ?, blocked_until = ?, generation = ?"
+                    " WHERE key = ?",
+                    (self.rate, self._tokens, self._updated, self._blocked_until, self._generation, self.key),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str) -> AdaptiveRateLimiter:
+    """
+    Returns the process-wide limiter for a backend ("triage" or "judge").
+    Names like "judge:2" get a separate limiter with the "judge" rates and
+    environment overrides (one per deployment of a judge pool).
+    Under pytest-xdist (or with RATE_LIMIT_SHARED=1) the limiter is shared by
+    all worker processes of the run.
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            kind = name.split(":")[0]
+            rate, max_rate = DEFAULT_RATES.get(kind, (1.0, 10.0))
+            rate = float(os.environ.get(f"{kind.upper()}_RATE_LIMIT", rate))
+            max_rate = float(os.environ.get(f"{kind.upper()}_MAX_RATE_LIMIT", max_rate))
+
+            if os.environ.get("PYTEST_XDIST_WORKER") or os.environ.get("RATE_LIMIT_SHARED") == "1":
+                _limiters[name] = SharedRateLimiter(
+                    name, rate, max(rate, max_rate),
+                    path=os.environ.get("RATE_LIMIT_STATE_PATH", DEFAULT_STATE_PATH),
+                    # Set by xdist to the same value in every worker of one run
+                    run_id=os.environ.get("PYTEST_XDIST_TESTRUNUID", "default"),
+                )
+            else:
+                _limiters[name] = AdaptiveRateLimiter(name, rate, max(rate, max_rate))
+        return _limiters[name]
+
+
+def reset_rate_limiters():
+    """Forgets every limiter, so the next get_rate_limiter() call starts from the configured rates."""
+    with _limiters_lock:
+        _limiters.clear()
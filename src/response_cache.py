@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+#---- Content-addressed cache for triage API outputs ------
+
+# Cache location and limits (override in your .env file)
+DEFAULT_CACHE_DIR = ".triage_cache"      # TRIAGE_CACHE_DIR
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600      # TRIAGE_CACHE_TTL: entries older than this are ignored
+DEFAULT_MAX_ENTRIES = 1000               # TRIAGE_CACHE_MAX_ENTRIES: least recently used entries are evicted
+
+
+def canonical_json(data) -> str:
+    """Serialises data the same way every time (sorted keys, no whitespace) for hashing."""
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+class ResponseCache:
+    """
+    On-disk cache of triage outputs, one JSON file per entry.
+
+    Entries are keyed by a hash of the canonicalised input payload, the endpoint
+    URL and an optional model-version tag, so a change to any of them is a miss.
+    A hit refreshes the file's mtime, which is what LRU eviction orders by.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def key(self, input_data: dict, endpoint: str, model_version: str = "") -> str:
+        material = "\n".join([canonical_json(input_data), endpoint, model_version or ""])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        """Returns the cached output string, or None if missing or expired."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if time.time() - entry.get("created", 0) > self.ttl_seconds:
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            pass
+        return entry["output"]
+
+    def put(self, key: str, output_string: str, endpoint: str = "", model_version: str = ""):
+        """Stores an output and evicts the least recently used entries over max_entries."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {
+            "created": time.time(),
+            "endpoint": endpoint,
+            "model_version": model_version,
+            "output": output_string,
+        }
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+            for path in entries[:len(entries) - self.max_entries]:
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide response cache configured from the environment."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                cache_dir=os.environ.get("TRIAGE_CACHE_DIR", DEFAULT_CACHE_DIR),
+                ttl_seconds=float(os.environ.get("TRIAGE_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+                max_entries=int(os.environ.get("TRIAGE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            )
+        return _cache
@@ -0,0 +1,181 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from src.telemetry import timed
+
+
+#---- Retrieval context selection ------
+
+# The documents get_retrieval_contexts() attaches in full
+CONTEXT_FILES = ["testdata/findings.txt", "testdata/triageDossier.txt", "testdata/policysearch.txt"]
+
+# Sections attached per metric when selecting (override with RETRIEVAL_TOP_K)
+DEFAULT_TOP_K = 5
+
+# How much retrieval context each metric gets, by metric name (anything else is "relevant"):
+#   "none"     metrics whose steps say not to judge against the retrieval context
+#   "full"     metrics that check the output against ALL of it (e.g. every review step)
+#   "relevant" the top-k sections for the scenario's input, expected and actual output
+# RETRIEVAL_MODE=full attaches every document to every metric, as before.
+METRIC_CONTEXT_MODES = {
+    "Hallucination": "none",
+    "Bias": "none",
+    "Prompt Adherence": "full",
+}
+
+# A line starting a new section: a markdown heading or a "**Step N: ...**" line
+_SECTION_START = re.compile(r"^\s*(#{1,6} |\*\*Step \d)")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_CAMEL_CASE = re.compile(r"([a-z0-9])([A-Z])")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "if", "in", "is", "it",
+    "of", "on", "or", "should", "that", "the", "this", "to", "was", "with", "any", "all", "not",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    # "LoanToValuePercent" -> loan, value, percent, so JSON field names match the policy wording
+    text = _CAMEL_CASE.sub(r"\1 \2", text).lower()
+    return [token for token in _TOKEN.findall(text) if token not in _STOPWORDS and len(token) > 1]
+
+
+def _json_text(text: str, include_keys: bool) -> str:
+    """The words in a JSON document (string values, optionally keys); the text itself if it is not JSON."""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return text or ""
+
+    words = []
+
+    def walk(value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if include_keys:
+                    words.append(key)
+                walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+        elif isinstance(value, str):
+            words.append(value)
+
+    walk(data)
+    return " ".join(words)
+
+
+def query_terms(test_case) -> dict:
+    """
+    Weighted query for a test case: the expected output counts double, then the
+    input's field names and values and the actual output's values (its field
+    names are the same for every scenario, so they are left out).
+    """
+    weights = {}
+    for text, weight in (
+        (_json_text(test_case.input, include_keys=True), 0.3),
+        (_json_text(test_case.actual_output, include_keys=False), 1.0),
+        (test_case.expected_output or "", 2.0),
+    ):
+        for term in tokenize(text):
+            weights[term] = max(weights.get(term, 0.0), weight)
+    return weights
+
+
+def chunk_document(source: str, text: str) -> list[dict]:
+    """Splits a document into sections at its headings; a document without headings is one chunk."""
+    chunks = []
+    current = []
+    for line in text.splitlines():
+        if _SECTION_START.match(line) and any(l.strip() for l in current):
+            chunks.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if any(l.strip() for l in current):
+        chunks.append("\n".join(current).strip())
+    return [{"source": source, "position": i, "text": chunk} for i, chunk in enumerate(chunks)]
+
+
+class BM25Index:
+    """Okapi BM25 over the document chunks; built once, searched per metric."""
+
+    def __init__(self, chunks: list[dict], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self._terms = [Counter(tokenize(chunk["text"])) for chunk in chunks]
+        self._lengths = [sum(terms.values()) for terms in self._terms]
+        self._average_length = sum(self._lengths) / max(1, len(self._lengths))
+        document_frequency = Counter(term for terms in self._terms for term in terms)
+        n = len(chunks)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, query: dict) -> list[float]:
+        # query maps term -> weight; each distinct term counts once, so a long input
+        # does not drown out the expected output
+        query = {term: weight for term, weight in query.items() if term in self._idf}
+        scores = []
+        for terms, length in zip(self._terms, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._average_length)
+            score = 0.0
+            for term, weight in query.items():
+                tf = terms.get(term)
+                if tf:
+                    score += weight * self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+    def search(self, query, top_k: int) -> list[dict]:
+        """
+        The top_k chunks matching a query (text, or term -> weight), in document
+        order so the judge reads them as written.
+        """
+        if isinstance(query, str):
+            query = dict.fromkeys(tokenize(query), 1.0)
+        ranked = sorted(zip(self.scores(query), range(len(self.chunks))), reverse=True)
+        picked = sorted(i for score, i in ranked[:top_k] if score > 0)
+        return [self.chunks[i] for i in picked]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_retrieval_index() -> BM25Index:
+    """The process-wide index of CONTEXT_FILES, chunked and built on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            chunks = []
+            for filename in CONTEXT_FILES:
+                try:
+                    with open(filename, "r") as f:
+                        chunks.extend(chunk_document(os.path.basename(filename), f.read()))
+                except FileNotFoundError:
+                    print(f"Error: Context file '{filename}' not found.")
+            _index = BM25Index(chunks)
+        return _index
+
+
+def context_mode(metric_name: str) -> str:
+    if os.environ.get("RETRIEVAL_MODE", "select") == "full":
+        return "full"
+    return METRIC_CONTEXT_MODES.get(metric_name, "relevant")
+
+
+def select_retrieval_context(metric_name: str, test_case) -> list[str]:
+    """
+    The retrieval context to give one metric for one test case. Returns the
+    test case's own (full) context in "full" mode.
+    """
+    mode = context_mode(metric_name)
+    if mode == "full":
+        return test_case.retrieval_context
+    if mode == "none":
+        return []
+
+    with timed("retrieval_select"):
+        top_k = int(os.environ.get("RETRIEVAL_TOP_K", DEFAULT_TOP_K))
+        return [chunk["text"] for chunk in get_retrieval_index().search(query_terms(test_case), top_k)]
@@ -0,0 +1,259 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from deepeval.test_case import LLMTestCase
+from src.compaction import compact_enabled, compact_test_case
+from src.fingerprints import scenario_fingerprint, run_environment
+from src.judge_usage import JudgeBudgetExhausted
+from src.prechecks import PRECHECK_RESULT, is_error_output, run_prechecks
+from src.retrieval import select_retrieval_context
+from src.telemetry import ScenarioTimings, start_scenario_timings, record_time, metric_scope, timed
+
+
+#---- Concurrent Scenario Runner ------
+
+# Default number of scenarios evaluated at the same time (override with SCENARIO_CONCURRENCY)
+DEFAULT_CONCURRENCY = 4
+
+
+@dataclass
+class ScenarioResult:
+    """The evaluated test case and per-metric results for one manifest scenario."""
+    test_case: LLMTestCase = None
+    results: dict = field(default_factory=dict)
+    test_failed: bool = False
+    error: BaseException = None
+    # Set (to the reason) when the scenario was not evaluated, e.g. the judge budget ran out
+    skipped: str = None
+    # True when the verdict was carried forward from an earlier run (--changed-only)
+    carried_forward: bool = False
+    # Seconds per phase (triage_call, triage_throttle_wait, metric:<name>, ...) and per-call records
+    timings: ScenarioTimings = None
+
+
+async def _measure_metric(metric, test_case: LLMTestCase) -> dict:
+    """Measures one metric; errors are reported as an ERROR result instead of raised."""
+    try:
+        with metric_scope(metric.name):
+            # Each metric only sees the retrieval context it needs (see src/retrieval.py)
+            if test_case.retrieval_context is not None:
+                test_case = test_case.model_copy(
+                    update={"retrieval_context": select_retrieval_context(metric.name, test_case)}
+                )
+            await metric.a_measure(test_case, _show_indicator=False)
+
+        return {
+            "score": metric.score,
+            "threshold": metric.threshold,
+            "reason": metric.reason,
+            "status": "PASS" if metric.is_successful() else "FAIL"
+        }
+
+    except JudgeBudgetExhausted:
+        # Not an evaluation error: the runner reports the scenario as skipped
+        raise
+
+    except Exception as e:
+        # Handle unexpected errors during metric evaluation (e.g., LLM server error)
+        return {
+            "score": 0.0,
+            "threshold": metric.threshold,
+            "reason": f"Evaluation Error: {e}",
+            "status": "ERROR"
+        }
+
+
+async def measure_metrics(metrics: list, test_case: LLMTestCase) -> dict:
+    """
+    Runs every metric against the test case concurrently and collects score,
+    threshold, reason and status per metric name. A scenario's judge latency is
+    the slowest metric rather than the sum of all of them, and one failing
+    metric does not stop the others being calculated/logged.
+    """
+    outcomes = await asyncio.gather(*(_measure_metric(metric, test_case) for metric in metrics))
+    return {metric.name: outcome for metric, outcome in zip(metrics, outcomes)}
+
+
+def metric_details(name: str, data: dict) -> str:
+    """The text block the Allure report attaches for one metric result."""
+    details = (
+        f"Metric: {name}\n"
+        f"Status: {data['status']}\n"
+        f"Score: {data['score']:.4f}\n"
+        f"Threshold: {data['threshold']:.4f}\n"
+        f"Reasoning: {data['reason']}"
+    )
+    # --judge-samples runs report the spread of the repeated scores
+    if "samples" in data:
+        details += (
+            f"\nSamples: {data['samples']} (mean {data['mean']}, variance {data['variance']}, "
+            f"{'decided' if data['decided'] else 'still ambiguous'})\n"
+            f"Sample scores: {data['sample_scores']}"
+        )
+    # --judge-escalation runs keep the cheap judge's verdict and, if it was borderline, the strong one's
+    for tier, verdict in data.get("tiers", {}).items():
+        details += (
+            f"\n\n[{tier} judge: {verdict['deployment']}] {verdict['status']}, score {verdict['score']:.4f}\n"
+            f"Reasoning: {verdict['reason']}"
+        )
+    return details
+
+
+def _carried_forward(verdict: dict, timings: ScenarioTimings) -> ScenarioResult:
+    """Rebuilds a scenario's result from the verdict stored in the eval index."""
+    test_case = LLMTestCase(
+        input=verdict["input"],
+        actual_output=verdict["actual_output"],
+        expected_output=verdict["expected_output"],
+    )
+    return ScenarioResult(test_case=test_case, results=verdict["results"], test_failed=verdict["test_failed"],
+                          timings=timings, carried_forward=True)
+
+
+class ScenarioRunner:
+    """
+    Evaluates a batch of manifest scenarios concurrently on one event loop.
+
+    A batch is a list of (category, scenario) pairs and may mix categories.
+    The first test of a batch triggers the evaluation of every pending scenario
+    in that batch (bounded by max_concurrency); later tests just pick up their
+    stored result, so Allure reporting and assertions stay per scenario.
+    """
+
+    def __init__(self, model, build_test_case, build_metrics, max_concurrency: int = DEFAULT_CONCURRENCY,
+                 index=None, changed_only: bool = False, escalation=None, sampler=None, combined=None):
+        # build_test_case is an async callable: scenario dict -> LLMTestCase
+        # build_metrics is a callable: category name -> that category's metrics for one
+        # scenario (EvaluationEngine.metrics_for in src/engine.py)
+        self.model = model
+        self.build_test_case = build_test_case
+        self.build_metrics = build_metrics
+        self.max_concurrency = max(1, max_concurrency)
+        # Optional EvalIndex (src/fingerprints.py): every verdict is recorded with the
+        # scenario's fingerprint; with changed_only, unchanged scenarios reuse theirs
+        self.index = index
+        self.changed_only = changed_only
+        # Optional JudgeEscalation (src/escalation.py): metrics are scored by a cheap
+        # deployment first and only borderline scores are re-judged by model
+        self.escalation = escalation
+        # Optional RepeatSampler (src/sampling.py): each metric is scored several times,
+        # stopping once the mean is clearly above or below the threshold
+        self.sampler = sampler
+        # Optional CombinedJudge (src/combined_judge.py): a scenario's metrics are scored
+        # in one structured-output call instead of one GEval call each
+        self.combined = combined
+        self._results = {}
+        # One persistent loop so the async OpenAI client keeps its connections between batches
+        self._loop = asyncio.new_event_loop()
+
+    def result_for(self, category: str, scenario: dict, batch: list[tuple] = None) -> ScenarioResult:
+        """Returns the result for one scenario, evaluating its whole batch of (category, scenario) pairs on first use."""
+        key = (category, scenario["scenario_name"])
+        if key not in self._results:
+            pending = [(c, s) for c, s in (batch or []) if (c, s["scenario_name"]) not in self._results]
+            if (category, scenario) not in pending:
+                pending.append((category, scenario))
+            self._loop.run_until_complete(self._run_batch(pending))
+
+        result = self._results[key]
+        if result.error is not None:
+            raise result.error
+        return result
+
+    async def _run_batch(self, batch: list[tuple]):
+        # With the judge in Batch API mode every scenario starts at once, so all of
+        # their prompts go into one batch job instead of max_concurrency at a time
+        # (the triage calls are still paced by the triage rate limiter)
+        in_batch_mode = getattr(self.model, "batch", None) is not None
+        semaphore = asyncio.Semaphore(max(len(batch), 1) if in_batch_mode else self.max_concurrency)
+        outcomes = await asyncio.gather(
+            *(self._evaluate(semaphore, category, scenario) for category, scenario in batch),
+            return_exceptions=True,
+        )
+        for (category, scenario), outcome in zip(batch, outcomes):
+            if isinstance(outcome, BaseException):
+                # Keep the failure with the scenario so only its own test errors
+                outcome = ScenarioResult(error=outcome)
+            self._results[(category, scenario["scenario_name"])] = outcome
+
+    async def _evaluate(self, semaphore: asyncio.Semaphore, category: str, scenario: dict) -> ScenarioResult:
+        judge_batch = getattr(self.model, "batch", None)
+        if judge_batch is None:
+            return await self._evaluate_scenario(semaphore, category, scenario, None)
+        # In Batch API mode the batch job is submitted once no scenario can add prompts to it
+        with judge_batch.producer() as producer:
+            return await self._evaluate_scenario(semaphore, category, scenario, producer)
+
+    async def _evaluate_scenario(self, semaphore: asyncio.Semaphore, category: str, scenario: dict, producer) -> ScenarioResult:
+        # Each scenario runs in its own task, so its timings stay separate from the others
+        timings = start_scenario_timings(scenario["scenario_name"], category)
+        queued = time.perf_counter()
+        async with semaphore:
+            record_time("runner_queue_wait", time.perf_counter() - queued)
+            # Scenarios already in flight finish; the rest are skipped once the budget is gone
+            if self.model.budget_exhausted():
+                return ScenarioResult(skipped="Judge token/cost budget exhausted", timings=timings)
+
+            # GEval objects hold their score/reason, so each scenario gets its own copies
+            metrics = self.build_metrics(category)
+
+            if self.index is not None:
+                key = self.index.key(category, scenario["scenario_name"])
+                environment = run_environment(self.model, self.escalation, self.sampler, self.combined)
+                fingerprint = scenario_fingerprint(scenario, metrics, environment)
+                verdict = self.index.get(key, fingerprint) if self.changed_only else None
+                if verdict is not None:
+                    return _carried_forward(verdict, timings)
+
+            test_case = await self.build_test_case(scenario)
+
+            # Deterministic checks first; the judge is only called when they cannot decide
+            with timed("prechecks"):
+                decided, precheck = run_prechecks(scenario, test_case.actual_output)
+            if decided:
+                results = {PRECHECK_RESULT: precheck}
+            else:
+                if producer is not None:
+                    producer.done()
+                # In Batch API mode every scenario gets past the check above at once; the
+                # prompts queued since then reserve their estimated tokens (src/judge_usage.py)
+                if self.model.budget_exhausted():
+                    return ScenarioResult(skipped="Judge token/cost budget exhausted", timings=timings)
+                # The judge gets minified JSON; the pretty test case is kept for Allure (src/compaction.py)
+                judge_case = compact_test_case(test_case) if compact_enabled() else test_case
+                try:
+                    if self.escalation is not None:
+                        results = await self.escalation.measure(category, metrics, judge_case, self._measure)
+                    else:
+                        results = await self._measure(metrics, judge_case)
+                except JudgeBudgetExhausted:
+                    return ScenarioResult(skipped="Judge token/cost budget exhausted", timings=timings)
+                if precheck is not None:
+                    results = {PRECHECK_RESULT: precheck, **results}
+
+        record_time("scenario_total", time.perf_counter() - queued)
+        test_failed = any(data["status"] != "PASS" for data in results.values())
+        # Evaluation errors and failed triage calls (connection/HTTP errors, nothing
+        # recorded to replay) are not verdicts, so those scenarios always re-run
+        recordable = (all(data["status"] != "ERROR" for data in results.values())
+                      and not is_error_output(test_case.actual_output))
+        if self.index is not None and recordable:
+            self.index.put(key, fingerprint, {
+                "input": test_case.input,
+                "actual_output": test_case.actual_output,
+                "expected_output": test_case.expected_output,
+                "results": results,
+                "test_failed": test_failed,
+            })
+        return ScenarioResult(test_case=test_case, results=results, test_failed=test_failed, timings=timings)
+
+    async def _measure(self, metrics: list, test_case: LLMTestCase) -> dict:
+        # Repeat sampling scores each metric on its own, so it takes precedence over the combined judge
+        if self.sampler is not None:
+            return await self.sampler.measure(metrics, test_case, measure_metrics)
+        if self.combined is not None and len(metrics) > 1:
+            return await self.combined.measure(metrics, test_case, measure_metrics)
+        return await measure_metrics(metrics, test_case)
+
+    def close(self):
+        self._loop.close()
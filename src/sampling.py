@@ -0,0 +1,174 @@
+import asyncio
+import copy
+import math
+import statistics
+import threading
+
+
+#---- Repeat sampling with early stopping ------
+#
+# The judge runs at temperature 1.0, so one GEval score near the threshold is
+# a coin flip. With --judge-samples N every metric is scored min_samples times
+# concurrently, then `step` more at a time, until a confidence interval around
+# the mean score lies clearly above or below the threshold, or N samples are
+# used. Clear-cut metrics stop after min_samples; only ambiguous ones use N.
+#
+# The interval is a two-sided Student-t interval, checked after every round.
+# GEval scores come in steps of SCORE_STEP, so a few samples are often
+# identical and their variance is 0. Rather than trusting that, the sample
+# variance is pooled with PRIOR_SAMPLES pseudo-samples of variance
+# SCORE_STEP ** 2; the prior fades as samples come in, so three unanimous
+# 1.0 scores against a 0.8 threshold stop at min_samples and unanimous 0.9
+# scores stop after one more round. The level is not split across rounds and
+# scores are discrete and bounded, not normal, so a metric whose true mean is
+# within a step of the threshold is sometimes stopped on the wrong side. That
+# costs little: such a metric is a coin flip with N samples too. Simulated with
+# two-valued scores (tests/unit/test_sampling.py), the wrong verdict rate with
+# early stopping stays within noise of always taking N samples, and metrics a
+# full step from the threshold are stopped on the wrong side in under 5% of runs.
+
+# Sampling settings (override in your .env file)
+DEFAULT_MIN_SAMPLES = 3         # JUDGE_SAMPLES_MIN: samples before the first check
+DEFAULT_STEP = 2                # JUDGE_SAMPLES_STEP: samples added per round after that
+DEFAULT_CONFIDENCE = 0.95       # JUDGE_SAMPLES_CONFIDENCE
+
+# Resolution of GEval scores (0-10 rubric, normalised to 0-1)
+SCORE_STEP = 0.1
+# Pseudo-samples of variance SCORE_STEP ** 2 the sample variance is pooled with
+PRIOR_SAMPLES = 1
+
+
+def _t_two_sided(t: float, df: int) -> float:
+    """P(|T| < t) for Student's t with df degrees of freedom (closed form for integer df)."""
+    theta = math.atan(abs(t) / math.sqrt(df))
+    cos2 = math.cos(theta) ** 2
+    if df == 1:
+        return 2 * theta / math.pi
+    term = total = 1.0
+    if df % 2 == 0:
+        for k in range(1, df // 2):
+            term *= cos2 * (2 * k - 1) / (2 * k)
+            total += term
+        return math.sin(theta) * total
+    for k in range(1, (df - 1) // 2):
+        term *= cos2 * (2 * k) / (2 * k + 1)
+        total += term
+    return 2 / math.pi * (theta + math.sin(theta) * math.cos(theta) * total)
+
+
+def t_quantile(p: float, df: int) -> float:
+    """The p quantile (p > 0.5) of Student's t with df degrees of freedom, by bisection."""
+    low, high = 0.0, 1.0
+    while 0.5 + _t_two_sided(high, df) / 2 < p:
+        high *= 2
+    for _ in range(100):
+        middle = (low + high) / 2
+        if 0.5 + _t_two_sided(middle, df) / 2 < p:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+class RepeatSampler:
+    """Scores each metric several times and stops once the mean is clearly on one side of the threshold."""
+
+    def __init__(self, max_samples: int, min_samples: int = DEFAULT_MIN_SAMPLES, step: int = DEFAULT_STEP,
+                 confidence: float = DEFAULT_CONFIDENCE):
+        self.max_samples = max(1, max_samples)
+        self.min_samples = max(2, min(min_samples, self.max_samples))
+        self.step = max(1, step)
+        self.confidence = confidence
+        # Two-sided t quantile per sample count (the prior adds its degrees of freedom)
+        level = 1 - (1 - confidence) / 2
+        self.t = {n: t_quantile(level, n - 1 + PRIOR_SAMPLES) for n in range(2, self.max_samples + 1)}
+        self._lock = threading.Lock()
+        self._stats = {"metrics": 0, "samples": 0, "undecided": 0}
+
+    def describe(self) -> dict:
+        """The settings that change verdicts, for the scenario fingerprint."""
+        return {"max": self.max_samples, "min": self.min_samples, "step": self.step, "confidence": self.confidence}
+
+    def interval(self, scores: list) -> tuple:
+        """(mean, variance, half-width of the confidence interval) of the scores so far."""
+        mean = statistics.fmean(scores)
+        variance = statistics.variance(scores) if len(scores) > 1 else 0.0
+        if len(scores) < 2:
+            return mean, variance, math.inf
+        # Pooled with the prior, so identical samples do not give a zero-width interval
+        pooled = (PRIOR_SAMPLES * SCORE_STEP ** 2 + (len(scores) - 1) * variance) / (PRIOR_SAMPLES + len(scores) - 1)
+        return mean, variance, self.t[len(scores)] * math.sqrt(pooled / len(scores))
+
+    def is_decided(self, scores: list, threshold: float) -> bool:
+        if len(scores) < self.min_samples:
+            return False
+        mean, _, half_width = self.interval(scores)
+        return mean - half_width > threshold or mean + half_width < threshold
+
+    async def measure(self, metrics: list, test_case, measure_metrics) -> dict:
+        """
+        Results per metric name, like measure_metrics (src/runner.py), with the
+        mean score as the verdict plus "samples", "mean", "variance",
+        "sample_scores" and "decided" (False when N samples did not settle it).
+        """
+        outcomes = {metric.name: [] for metric in metrics}
+        pending = list(metrics)
+        while pending:
+            # GEval keeps its score on itself, so every sample gets its own copy
+            round_metrics = []
+            for metric in pending:
+                taken = len(outcomes[metric.name])
+                wanted = self.min_samples if taken == 0 else self.step
+                round_metrics += [copy.copy(metric) for _ in range(min(wanted, self.max_samples - taken))]
+            round_results = await asyncio.gather(*(measure_metrics([metric], test_case) for metric in round_metrics))
+            for metric, result in zip(round_metrics, round_results):
+                outcomes[metric.name].append(result[metric.name])
+
+            pending = [
+                metric for metric in pending
+                if len(outcomes[metric.name]) < self.max_samples
+                and not self.is_decided(_scores(outcomes[metric.name]), metric.threshold)
+            ]
+
+        results = {metric.name: self._summarise(metric, outcomes[metric.name]) for metric in metrics}
+        with self._lock:
+            self._stats["metrics"] += len(results)
+            self._stats["samples"] += sum(result["samples"] for result in results.values())
+            self._stats["undecided"] += sum(not result["decided"] for result in results.values())
+        return results
+
+    def _summarise(self, metric, outcomes: list) -> dict:
+        scores = _scores(outcomes)
+        if not scores:
+            # Every sample errored: report the first error
+            return {**outcomes[0], "samples": len(outcomes), "mean": None, "variance": None,
+                    "sample_scores": [], "decided": False}
+        mean, variance, half_width = self.interval(scores)
+        passed = mean >= metric.threshold
+        # The reason of the sample closest to the mean speaks for the verdict
+        typical = min((o for o in outcomes if o["status"] != "ERROR"), key=lambda o: abs(o["score"] - mean))
+        return {
+            "score": mean,
+            "threshold": metric.threshold,
+            "reason": f"Mean of {len(scores)} samples (variance {variance:.4f}, "
+                      f"+/-{half_width:.4f} at {self.confidence:.0%}). {typical['reason']}",
+            "status": "PASS" if passed else "FAIL",
+            "samples": len(outcomes),
+            "mean": mean,
+            "variance": variance,
+            "sample_scores": [o["score"] if o["status"] != "ERROR" else None for o in outcomes],
+            "decided": self.is_decided(scores, metric.threshold),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        # What the same run would have cost with N samples of every metric
+        stats["max_samples"] = stats["metrics"] * self.max_samples
+        stats["samples_saved"] = stats["max_samples"] - stats["samples"]
+        return stats
+
+
+def _scores(outcomes: list) -> list:
+    """The scores of the samples that did not error."""
+    return [o["score"] for o in outcomes if o["status"] != "ERROR" and o["score"] is not None]
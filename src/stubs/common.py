@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+#---- Shared pieces of the local stand-in servers ------
+
+class Latency:
+    """
+    Seeded latency distribution, parsed from a spec string:
+      "0"                 no delay
+      "fixed:2.5"         always 2.5s
+      "uniform:1,3"       between 1s and 3s
+      "normal:2,0.5"      mean 2s, standard deviation 0.5s (never below 0)
+      "lognormal:0.7,0.4" log-normal with mu 0.7 and sigma 0.4 (long tail, like real LLM calls)
+    """
+
+    def __init__(self, spec: str = "0", seed: int = 0):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind if params else "fixed"
+        self.params = [float(p) for p in (params or kind).split(",")]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed":
+                return self.params[0]
+            if self.kind == "uniform":
+                return self._random.uniform(*self.params)
+            if self.kind == "normal":
+                return max(0.0, self._random.gauss(*self.params))
+            if self.kind == "lognormal":
+                return self._random.lognormvariate(*self.params)
+        raise ValueError(f"Unknown latency distribution: {self.spec}")
+
+
+class ServerRateLimit:
+    """
+    Server-side token bucket. allow() returns 0 when a request may proceed, or
+    the whole number of seconds the client should wait before retrying.
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self) -> int:
+        if self.rate <= 0:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return max(1, int((1 - self._tokens) / self.rate + 0.999))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """JSON request handler with keep-alive, so the clients' connection pools are exercised."""
+    protocol_version = "HTTP/1.1"
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length)
+
+    def send_body(self, status: int, body: str, headers: dict = None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable
+        pass
+
+
+class StubServer:
+    """Runs a stub handler on a background thread; use as a context manager or start()/stop()."""
+
+    def __init__(self, handler_class, host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), handler_class)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self if self._thread else self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,296 @@
+"""
+Local OpenAI-compatible stand-in for the Azure judge deployment.
+
+Answers chat completions with deterministic GEval-shaped JSON (score + reason),
+reports token usage and can inject latency and 429 rate-limit errors, so the
+harness's own overhead and concurrency can be measured without spending quota.
+Prompt caching is simulated like Azure's: the longest prompt prefix seen
+before (from 1,024 tokens, in 128-token steps) is reported as cached tokens,
+and cached tokens do not count towards --per-token-latency.
+The rate limit applies per deployment name, like separate Azure deployments
+each with their own quota (see src/judge_pool.py).
+It also serves the Files and Batches endpoints the judge's Batch API mode uses
+(src/judge_batch.py); a batch completes after --batch-latency seconds.
+
+    python -m src.stubs.judge_server --port 7085 --latency lognormal:0,0.5 --rate-limit 10
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:7085 AZURE_OPENAI_API_KEY=stub pytest ...
+"""
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+from src.stubs.common import Latency, ServerRateLimit, StubHandler, StubServer
+
+
+class JudgeStub:
+    """Behaviour and counters of one stand-in judge deployment."""
+
+    # Azure prompt caching: prefixes from CACHE_MIN_TOKENS, matched in CACHE_BLOCK_TOKENS steps
+    CACHE_MIN_TOKENS = 1024
+    CACHE_BLOCK_TOKENS = 128
+
+    def __init__(self, latency: Latency = None, rate_limit: ServerRateLimit = None,
+                 completion_tokens: int = 60, chars_per_token: float = 4.0, per_token_latency: float = 0.0,
+                 min_score: int = 6, max_score: int = 10, batch_latency: Latency = None, score_jitter: int = 0,
+                 seed: int = 0):
+        self.latency = latency or Latency("0")
+        self.batch_latency = batch_latency or Latency("0")
+        self.rate_limit = rate_limit or ServerRateLimit(0)
+        # deployment name -> its own bucket with the rate and burst of rate_limit
+        self.deployment_limits = {}
+        self.completion_tokens = completion_tokens
+        self.chars_per_token = chars_per_token
+        self.per_token_latency = per_token_latency     # extra seconds per prompt token
+        self.min_score = min_score
+        self.max_score = max_score
+        # Up to this many points added or taken off each answer, like a judge at temperature 1.0
+        self.score_jitter = score_jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "completions": 0, "throttled": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                      "cached_tokens": 0, "batches": 0, "batch_requests": 0}
+        # Hashes of the prompt prefixes seen so far, one per CACHE_BLOCK_TOKENS boundary
+        self.prefixes = set()
+        # Uploaded/produced files (id -> {"meta", "content"}) and batch jobs (id -> batch object)
+        self.files = {}
+        self.batches = {}
+        self._ids = itertools.count(1)
+
+    def limit_for(self, deployment: str) -> ServerRateLimit:
+        with self._lock:
+            if deployment not in self.deployment_limits:
+                self.deployment_limits[deployment] = ServerRateLimit(self.rate_limit.rate, self.rate_limit.burst)
+            return self.deployment_limits[deployment]
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def prompt_tokens(self, messages: list) -> int:
+        text = "".join(str(message.get("content", "")) for message in messages)
+        return max(1, int(len(text) / self.chars_per_token))
+
+    def cached_tokens(self, messages: list) -> int:
+        """Tokens of the longest prefix of this prompt seen before (0 below CACHE_MIN_TOKENS); remembers its prefixes."""
+        text = "".join(str(message.get("content", "")) for message in messages)
+        block = int(self.CACHE_BLOCK_TOKENS * self.chars_per_token)
+        hits = 0
+        with self._lock:
+            for blocks, end in enumerate(range(block, len(text) + 1, block), 1):
+                digest = hashlib.sha256(text[:end].encode("utf-8")).digest()
+                if digest in self.prefixes and hits == blocks - 1:
+                    hits = blocks
+                self.prefixes.add(digest)
+        cached = hits * self.CACHE_BLOCK_TOKENS
+        return cached if cached >= self.CACHE_MIN_TOKENS else 0
+
+    def score(self, text: str) -> int:
+        """Same text, same score (derived from its hash), unless score_jitter is set."""
+        digest = int(hashlib.sha256(text.encode("utf-8")).hexdigest(), 16)
+        score = self.min_score + digest % (self.max_score - self.min_score + 1)
+        if self.score_jitter:
+            with self._lock:
+                score += self._random.randint(-self.score_jitter, self.score_jitter)
+            score = max(0, min(10, score))
+        return score
+
+    def answer(self, messages: list, response_format: dict = None) -> str:
+        """A GEval-shaped {"score", "reason"}, or one per property of a json_schema response_format."""
+        text = "".join(str(message.get("content", "")) for message in messages)
+        schema = ((response_format or {}).get("json_schema") or {}).get("schema") or {}
+        if schema.get("properties"):
+            # Structured output, e.g. the combined judge: {metric name: {"score", "reason"}}
+            answer = {}
+            for name in schema["properties"]:
+                score = self.score(text + name)
+                answer[name] = {"score": score, "reason": f"Stub judge: deterministic score {score} for {name}."}
+            return json.dumps(answer)
+        score = self.score(text)
+        return json.dumps({"score": score, "reason": f"Stub judge: deterministic score {score} for this prompt."})
+
+    def completion(self, request: dict, cached_tokens: int = None) -> dict:
+        """The chat completion body for a request (counted in the stats)."""
+        messages = request.get("messages", [])
+        prompt_tokens = self.prompt_tokens(messages)
+        if cached_tokens is None:
+            cached_tokens = self.cached_tokens(messages)
+        self.count("completions")
+        self.count("prompt_tokens", prompt_tokens)
+        self.count("completion_tokens", self.completion_tokens)
+        self.count("cached_tokens", cached_tokens)
+        return {
+            "id": f"chatcmpl-stub-{self.stats['completions']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.answer(messages, request.get("response_format"))},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": prompt_tokens + self.completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        }
+
+    #---- Files and Batches ------
+
+    def new_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}-stub-{next(self._ids)}"
+
+    def add_file(self, filename: str, content: bytes, purpose: str) -> dict:
+        meta = {
+            "id": self.new_id("file"), "object": "file", "bytes": len(content), "created_at": int(time.time()),
+            "filename": filename, "purpose": purpose, "status": "processed",
+        }
+        self.files[meta["id"]] = {"meta": meta, "content": content}
+        return meta
+
+    def create_batch(self, request: dict) -> dict:
+        batch = {
+            "id": self.new_id("batch"), "object": "batch", "endpoint": request.get("endpoint"),
+            "input_file_id": request.get("input_file_id"), "completion_window": request.get("completion_window", "24h"),
+            "status": "validating", "created_at": int(time.time()), "output_file_id": None, "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        self.batches[batch["id"]] = batch
+        self.count("batches")
+        threading.Thread(target=self._process_batch, args=(batch,), daemon=True).start()
+        return batch
+
+    def _process_batch(self, batch: dict):
+        """Answers every line of the input file after the batch latency, like a finished Batch API job."""
+        source = self.files.get(batch["input_file_id"])
+        if source is None:
+            batch.update(status="failed", errors={"object": "list", "data": [
+                {"code": "invalid_file", "message": f"File {batch['input_file_id']} not found"}]})
+            return
+        lines = [json.loads(line) for line in source["content"].decode("utf-8").splitlines() if line.strip()]
+        batch.update(status="in_progress", in_progress_at=int(time.time()))
+        batch["request_counts"]["total"] = len(lines)
+        time.sleep(self.batch_latency.sample())
+
+        output = []
+        for line in lines:
+            self.count("batch_requests")
+            output.append(json.dumps({
+                "custom_id": line["custom_id"],
+                "response": {"status_code": 200, "request_id": self.new_id("req"), "body": self.completion(line["body"])},
+                "error": None,
+            }))
+        batch["request_counts"]["completed"] = len(lines)
+        output_file = self.add_file(f"{batch['id']}_output.jsonl", ("\n".join(output) + "\n").encode("utf-8"), "batch_output")
+        batch.update(status="completed", output_file_id=output_file["id"], completed_at=int(time.time()))
+
+
+class JudgeHandler(StubHandler):
+
+    def do_GET(self):
+        stub = self.server.stub
+        path = urlsplit(self.path).path
+        if path == "/stats":
+            self.send_body(200, json.dumps(stub.stats))
+        elif path.startswith("/openai/batches/") and path.rsplit("/", 1)[-1] in stub.batches:
+            self.send_body(200, json.dumps(stub.batches[path.rsplit("/", 1)[-1]]))
+        elif path.startswith("/openai/files/") and path.endswith("/content") and path.split("/")[-2] in stub.files:
+            self.send_body(200, stub.files[path.split("/")[-2]]["content"].decode("utf-8"))
+        else:
+            self.send_body(404, json.dumps({"error": {"code": "404", "message": "Not Found"}}))
+
+    def do_POST(self):
+        stub = self.server.stub
+        path = urlsplit(self.path).path
+        body = self.read_body()
+        stub.count("requests")
+
+        if path == "/openai/files":
+            self.send_body(200, json.dumps(self.upload(body)))
+            return
+        if path == "/openai/batches":
+            self.send_body(200, json.dumps(stub.create_batch(json.loads(body or b"{}"))))
+            return
+        if "/chat/completions" not in path:
+            self.send_body(404, json.dumps({"error": {"code": "404", "message": "Resource not found"}}))
+            return
+
+        request = json.loads(body or b"{}")
+        # /openai/deployments/{deployment}/chat/completions
+        parts = path.split("/")
+        deployment = parts[parts.index("deployments") + 1] if "deployments" in parts else request.get("model", "")
+        wait = stub.limit_for(deployment).allow()
+        if wait:
+            stub.count("throttled")
+            error = {"error": {
+                "code": "429",
+                "message": f"Requests to the ChatCompletions_Create Operation have exceeded the call rate limit. "
+                           f"Please retry after {wait} seconds.",
+            }}
+            self.send_body(429, json.dumps(error), {"Retry-After": wait})
+            return
+
+        prompt_tokens = stub.prompt_tokens(request.get("messages", []))
+        cached_tokens = stub.cached_tokens(request.get("messages", []))
+        time.sleep(stub.latency.sample() + (prompt_tokens - cached_tokens) * stub.per_token_latency)
+        self.send_body(200, json.dumps(stub.completion(request, cached_tokens)))
+
+    def upload(self, body: bytes) -> dict:
+        """Stores a multipart/form-data file upload (fields "file" and "purpose")."""
+        header = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8")
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + body)
+        fields = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+        upload = fields["file"]
+        purpose = fields["purpose"].get_content().strip() if "purpose" in fields else "batch"
+        return self.server.stub.add_file(upload.get_filename() or "upload.jsonl", upload.get_payload(decode=True), purpose)
+
+
+def start_judge_stub(stub: JudgeStub, host: str = "127.0.0.1", port: int = 0) -> StubServer:
+    """Starts the stand-in on a background thread. Use server.base_url as AZURE_OPENAI_ENDPOINT."""
+    server = StubServer(JudgeHandler, host, port)
+    server.httpd.stub = stub
+    return server.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in for the Azure judge.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7085)
+    parser.add_argument("--latency", default="0", help='e.g. "fixed:2", "uniform:1,3", "lognormal:0,0.5"')
+    parser.add_argument("--per-token-latency", type=float, default=0.0, help="Extra seconds per prompt token.")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests/second before 429s (0 = off).")
+    parser.add_argument("--burst", type=float, default=1.0)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    parser.add_argument("--batch-latency", default="5", help="Seconds until a submitted batch completes (same syntax as --latency).")
+    parser.add_argument("--score-jitter", type=int, default=0, help="Add up to +/- this many points to each score.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stub = JudgeStub(
+        latency=Latency(args.latency, args.seed),
+        rate_limit=ServerRateLimit(args.rate_limit, args.burst),
+        completion_tokens=args.completion_tokens,
+        per_token_latency=args.per_token_latency,
+        batch_latency=Latency(args.batch_latency, args.seed),
+        score_jitter=args.score_jitter,
+        seed=args.seed,
+    )
+    server = start_judge_stub(stub, args.host, args.port)
+    print(f"Judge stand-in serving at {server.base_url} (set AZURE_OPENAI_ENDPOINT to this)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
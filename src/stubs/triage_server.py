@@ -0,0 +1,214 @@
+"""
+Local stand-in for the /api/Proposals/test-triage service.
+
+Replays recorded outputs per input hash, injects latency and returns the same
+429 / 400-RateLimitReached responses the real service sends, so the runner's
+concurrency, throttling and retry paths can be exercised offline.
+
+    python -m src.stubs.triage_server --port 7084 --latency lognormal:0.7,0.4 --rate-limit 2
+    TRIAGE_API_ENDPOINT=http://127.0.0.1:7084/api/Proposals/test-triage pytest -k tierA
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import requests
+from src.response_cache import canonical_json
+from src.stubs.common import Latency, ServerRateLimit, StubHandler, StubServer
+
+
+TRIAGE_PATH = "/api/Proposals/test-triage"
+
+# Returned for inputs with no recording (unless --unknown 404 is given)
+DEFAULT_OUTPUT = {
+    "content": {
+        "triageFlags": [],
+        "reasoning": "Stub response: no recorded output for this input."
+    },
+    "message": "",
+    "isSuccessStatusCode": True
+}
+
+
+def input_hash(input_data) -> str:
+    return hashlib.sha256(canonical_json(input_data).encode("utf-8")).hexdigest()
+
+
+def load_recordings(testdata_dir: str = "testdata", recordings_file: str = None) -> dict:
+    """
+    Maps input hash -> output JSON string, from every manifest's input.json /
+    output.json pair and, if given, a JSONL file of {"input_hash", "output"} lines.
+    """
+    recordings = {}
+    for manifest in glob.glob(os.path.join(testdata_dir, "*", "dataset_*.json")):
+        with open(manifest, "r") as f:
+            scenarios = json.load(f)
+        for scenario in scenarios:
+            try:
+                with open(os.path.join(testdata_dir, scenario["input_file"]), "r") as f:
+                    key = input_hash(json.load(f))
+                with open(os.path.join(testdata_dir, scenario["output_file"]), "r", encoding="utf-8") as f:
+                    recordings[key] = f.read()
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+
+    if recordings_file and os.path.exists(recordings_file):
+        with open(recordings_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    recordings[entry["input_hash"]] = entry["output"]
+    return recordings
+
+
+class TriageStub:
+    """Behaviour and counters of one stand-in triage service."""
+
+    def __init__(self, recordings: dict, latency: Latency = None, rate_limit: ServerRateLimit = None,
+                 throttle_style: str = "429", throttle_probability: float = 0.0, retry_after: int = 1,
+                 unknown: str = "ok", upstream: str = None, recordings_file: str = None, seed: int = 0):
+        self.recordings = recordings
+        self.latency = latency or Latency("0")
+        self.rate_limit = rate_limit or ServerRateLimit(0)
+        self.throttle_style = throttle_style        # "429", "400" or "mixed"
+        self.throttle_probability = throttle_probability
+        self.retry_after = retry_after
+        self.unknown = unknown                      # "ok" or "404"
+        self.upstream = upstream                    # record mode: forward misses to the real service
+        self.recordings_file = recordings_file
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "replayed": 0, "recorded": 0, "unknown": 0, "throttled": 0}
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def throttle(self):
+        """Returns (status, body, headers) for a rate-limited request, or None to serve it."""
+        wait = self.rate_limit.allow()
+        with self._lock:
+            if not wait and self._random.random() < self.throttle_probability:
+                wait = self.retry_after
+            if not wait:
+                return None
+            style = self.throttle_style
+            if style == "mixed":
+                style = self._random.choice(["429", "400"])
+
+        self.count("throttled")
+        if style == "400":
+            # Same shape as the Azure error the real service passes through
+            body = json.dumps({"error": {
+                "code": "RateLimitReached",
+                "message": f"Your requests have exceeded the call rate limit. Please retry after {wait} seconds.",
+            }})
+            return 400, body, {}
+        body = json.dumps({"error": {"code": "429", "message": "Too Many Requests"}})
+        return 429, body, {"Retry-After": wait}
+
+    def respond(self, input_data):
+        """Returns (status, body) for an accepted request."""
+        key = input_hash(input_data)
+        if key in self.recordings:
+            self.count("replayed")
+            return 200, self.recordings[key]
+
+        if self.upstream:
+            resp = requests.post(self.upstream, data=json.dumps(input_data, ensure_ascii=False),
+                                 headers={"Content-Type": "application/json"}, verify=False, timeout=600)
+            if resp.ok:
+                self.recordings[key] = resp.text
+                self.count("recorded")
+                if self.recordings_file:
+                    with self._lock, open(self.recordings_file, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({"input_hash": key, "output": resp.text}, ensure_ascii=False) + "\n")
+            return resp.status_code, resp.text
+
+        self.count("unknown")
+        if self.unknown == "404":
+            return 404, json.dumps({"error": "No recording for this input"})
+        return 200, json.dumps(DEFAULT_OUTPUT)
+
+
+class TriageHandler(StubHandler):
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_body(200, json.dumps(self.server.stub.stats))
+        else:
+            self.send_body(404, json.dumps({"error": "Not Found"}))
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.read_body()
+        stub.count("requests")
+
+        throttled = stub.throttle()
+        if throttled is not None:
+            status, response_body, headers = throttled
+            self.send_body(status, response_body, headers)
+            return
+
+        try:
+            input_data = json.loads(body)
+        except json.JSONDecodeError:
+            self.send_body(400, json.dumps({"error": "Invalid JSON"}))
+            return
+
+        time.sleep(stub.latency.sample())
+        status, response_body = stub.respond(input_data)
+        self.send_body(status, response_body)
+
+
+def start_triage_stub(stub: TriageStub, host: str = "127.0.0.1", port: int = 0) -> StubServer:
+    """Starts the stand-in on a background thread. Its endpoint is server.base_url + TRIAGE_PATH."""
+    server = StubServer(TriageHandler, host, port)
+    server.httpd.stub = stub
+    return server.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the test-triage endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7084)
+    parser.add_argument("--testdata", default="testdata", help="Directory whose manifests provide recorded outputs.")
+    parser.add_argument("--recordings-file", help="JSONL of extra recordings; record mode appends to it.")
+    parser.add_argument("--upstream", help="Record mode: forward unrecorded inputs to this real endpoint.")
+    parser.add_argument("--latency", default="0", help='e.g. "fixed:2", "uniform:1,3", "lognormal:0.7,0.4"')
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests/second before throttling (0 = off).")
+    parser.add_argument("--burst", type=float, default=1.0)
+    parser.add_argument("--throttle-style", choices=["429", "400", "mixed"], default="429")
+    parser.add_argument("--throttle-probability", type=float, default=0.0, help="Extra random throttling.")
+    parser.add_argument("--retry-after", type=int, default=1, help="Wait suggested for random throttles.")
+    parser.add_argument("--unknown", choices=["ok", "404"], default="ok")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stub = TriageStub(
+        load_recordings(args.testdata, args.recordings_file),
+        latency=Latency(args.latency, args.seed),
+        rate_limit=ServerRateLimit(args.rate_limit, args.burst),
+        throttle_style=args.throttle_style,
+        throttle_probability=args.throttle_probability,
+        retry_after=args.retry_after,
+        unknown=args.unknown,
+        upstream=args.upstream,
+        recordings_file=args.recordings_file,
+        seed=args.seed,
+    )
+    server = start_triage_stub(stub, args.host, args.port)
+    print(f"Triage stand-in serving {len(stub.recordings)} recordings at {server.base_url}{TRIAGE_PATH}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
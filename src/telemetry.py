@@ -0,0 +1,147 @@
+import contextvars
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+#---- Per-scenario phase timings ------
+
+class ScenarioTimings:
+    """Seconds spent per phase (triage call, throttle wait, each metric, ...) for one scenario."""
+
+    def __init__(self, scenario: str = None, category: str = None):
+        self.scenario = scenario
+        self.category = category
+        self.phases = defaultdict(float)
+        self.counts = defaultdict(int)
+        # One record per triage/judge call made for this scenario (see call_telemetry)
+        self.calls = []
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] += seconds
+        self.counts[phase] += 1
+
+    def as_dict(self) -> dict:
+        return {phase: round(seconds, 6) for phase, seconds in self.phases.items()}
+
+    def as_report(self) -> dict:
+        """Phase timings plus every call record, as attached to the Allure test."""
+        return {"scenario": self.scenario, "category": self.category, "phases": self.as_dict(), "calls": self.calls}
+
+
+# The timings of the scenario being evaluated. asyncio tasks and asyncio.to_thread
+# copy the context, so each concurrent scenario records into its own object.
+_current_timings = contextvars.ContextVar("current_timings", default=None)
+
+
+def start_scenario_timings(scenario: str = None, category: str = None) -> ScenarioTimings:
+    """Starts collecting timings for the scenario running in the current task."""
+    timings = ScenarioTimings(scenario, category)
+    _current_timings.set(timings)
+    return timings
+
+
+def record_time(phase: str, seconds: float):
+    """Adds time to a phase of the current scenario; a no-op outside a scenario."""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+@contextmanager
+def timed(phase: str):
+    """Times the enclosed block as a phase of the current scenario."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_time(phase, time.perf_counter() - start)
+
+
+#---- Per-call telemetry ------
+
+# Name of the metric being measured; set per metric task by metric_scope()
+_current_metric = contextvars.ContextVar("current_metric", default=None)
+
+# Run-level JSONL log of every call record (opened by conftest, None = not written)
+_run_log = None
+_run_log_lock = threading.Lock()
+
+
+@contextmanager
+def metric_scope(metric_name: str):
+    """Times a metric and tags the judge calls made inside it with the metric name."""
+    token = _current_metric.set(metric_name)
+    try:
+        with timed(f"metric:{metric_name}"):
+            yield
+    finally:
+        _current_metric.reset(token)
+
+
+def open_run_log(path: str):
+    """Starts writing one JSON line per triage/judge call to path (truncates it)."""
+    global _run_log
+    close_run_log()
+    _run_log = open(path, "w", encoding="utf-8")
+
+
+def close_run_log():
+    global _run_log
+    with _run_log_lock:
+        if _run_log is not None:
+            _run_log.close()
+            _run_log = None
+
+
+def _write_run_log(record: dict):
+    with _run_log_lock:
+        if _run_log is not None:
+            _run_log.write(json.dumps(record, ensure_ascii=False) + "\n")
+            _run_log.flush()
+
+
+@contextmanager
+def call_telemetry(kind: str):
+    """
+    Records one logical triage or judge call, including all its retries.
+    The caller fills in the yielded record (status, ttfb_seconds, retries,
+    tokens, ...) and adds the seconds spent on the wire to request_seconds;
+    wall time and backoff (everything that was not a request: limiter waits
+    and retry sleeps) are filled in on exit. The record is added to the
+    current scenario's timings and written to the run log.
+    """
+    timings = _current_timings.get()
+    record = {
+        "kind": kind,
+        "scenario": timings.scenario if timings is not None else None,
+        "category": timings.category if timings is not None else None,
+        "metric": _current_metric.get(),
+        "source": "endpoint",
+        "status": None,
+        "error": None,
+        "retries": 0,
+        "wall_seconds": 0.0,
+        "ttfb_seconds": None,
+        "request_seconds": 0.0,
+        "backoff_seconds": 0.0,
+        "prompt_tokens": 0,
+        "cached_tokens": 0,
+        "completion_tokens": 0,
+    }
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = record["error"] or e.__class__.__name__
+        raise
+    finally:
+        record["wall_seconds"] = round(time.perf_counter() - start, 6)
+        record["request_seconds"] = round(record["request_seconds"], 6)
+        if record["source"] == "endpoint":
+            record["backoff_seconds"] = round(max(0.0, record["wall_seconds"] - record["request_seconds"]), 6)
+        if timings is not None:
+            timings.calls.append(record)
+        _write_run_log(record)
@@ -1,61 +1,229 @@
 import pytest
 import os
 import json
-from deepeval.test_case import LLMTestCase
-from src.test_azure import AzureOpenAIModel, get_retrieval_contexts, get_ai_output_from_api
+import allure
+from typing import TYPE_CHECKING
+from dotenv import load_dotenv
+from src.telemetry import timed, open_run_log, close_run_log
+from src.judge_usage import get_judge_usage, BUDGET_ACTIONS
 
-def load_manifest(filename: str) -> list[dict]:
-    """Loads the list of scenario metadata from a manifest file."""
-    path = os.path.join("testdata", filename)
-    with open(path, "r") as f:
-        return json.load(f)
+# deepeval, openai and the harness modules built on them (src.test_azure, src.runner,
+# src.fingerprints) take seconds to import, so they are imported where they are
+# first used. Collecting tests or starting a run never waits for them.
+if TYPE_CHECKING:
+    from deepeval.test_case import LLMTestCase
 
-# --- Fixture to load all Low Risk scenarios for parameterization ---
+#load environment variables (the option defaults below read them)
+load_dotenv()
 
-def load_tierA_scenarios() -> list[dict]:
-    """Provides the list of metadata for all low-risk test cases."""
-    return load_manifest("tierA/dataset_tierA.json")
+# The judge deployment pool of this process (set by azure_model) and the per-deployment
+# counts reported by pytest-xdist workers, for the terminal summary
+JUDGE_POOL = pytest.StashKey()
+JUDGE_POOL_ROWS = pytest.StashKey()
+# The run's JudgeEscalation (set by scenario_runner with --judge-escalation) and the
+# escalation counts reported by pytest-xdist workers
+JUDGE_ESCALATION = pytest.StashKey()
+JUDGE_ESCALATION_ROWS = pytest.StashKey()
+# Likewise for the RepeatSampler of --judge-samples runs
+JUDGE_SAMPLER = pytest.StashKey()
+JUDGE_SAMPLER_ROWS = pytest.StashKey()
+
+#--- Command Line Options ---
+def pytest_addoption(parser):
+    group = parser.getgroup("triage", "AI triage evaluation")
+    group.addoption(
+        "--triage-cache", action="store_true", default=False,
+        help="Reuse cached triage API outputs for unchanged inputs; only call the endpoint on a cache miss.",
+    )
+    group.addoption(
+        "--replay", action="store_true", default=False,
+        help="Never call the triage endpoint: serve outputs from the cache or the scenarios' output.json files.",
+    )
+    group.addoption(
+        "--no-judge-cache", action="store_true", default=False,
+        help="Send every GEval prompt to Azure, e.g. for stochastic sampling runs.",
+    )
+    group.addoption(
+        "--judge-batch", action="store_true", default=os.environ.get("JUDGE_BATCH", "off") == "on",
+        help="Send the GEval prompts through the Azure OpenAI Batch API (AZURE_OPENAI_BATCH_DEPLOYMENT_NAME) "
+             "instead of interactive calls, e.g. for nightly runs. Env: JUDGE_BATCH=on.",
+    )
+    group.addoption(
+        "--judge-escalation", action="store_true", default=os.environ.get("JUDGE_ESCALATION", "off") == "on",
+        help="Score every metric on the cheap deployment (AZURE_OPENAI_CHEAP_DEPLOYMENT_NAME) first and re-judge only "
+             "scores within JUDGE_ESCALATION_BAND of the threshold on the main deployment. Env: JUDGE_ESCALATION=on.",
+    )
+    group.addoption(
+        "--judge-samples", type=int, default=int(os.environ.get("JUDGE_SAMPLES", "1")),
+        help="Score each metric up to this many times, stopping early once the mean is clearly above or below the "
+             "threshold (see src/sampling.py); implies --no-judge-cache. Env: JUDGE_SAMPLES.",
+    )
+    group.addoption(
+        "--judge-combined", action="store_true", default=os.environ.get("JUDGE_COMBINED", "off") == "on",
+        help="Score all of a scenario's metrics in one judge call with structured output instead of one GEval call "
+             "per metric (see src/combined_judge.py). Env: JUDGE_COMBINED=on.",
+    )
+    group.addoption(
+        "--changed-only", action="store_true", default=False,
+        help="Only evaluate scenarios whose input, expectations, metrics, context or endpoint changed since their last "
+             "recorded verdict; the rest carry that verdict forward.",
+    )
+    group.addoption(
+        "--telemetry-jsonl", default=os.environ.get("TELEMETRY_JSONL", "reports/telemetry.jsonl"),
+        help="Write one JSON line per triage/judge call (timings, retries, status, tokens) here; '' to disable.",
+    )
+    group.addoption(
+        "--judge-token-budget", type=int, default=None,
+        help="Stop (or downgrade) judging once the run has used this many judge tokens. Env: JUDGE_TOKEN_BUDGET.",
+    )
+    group.addoption(
+        "--judge-cost-budget", type=float, default=None,
+        help="Stop (or downgrade) judging once the run's judge calls cost this many USD (see JUDGE_PRICES). Env: JUDGE_COST_BUDGET.",
+    )
+    group.addoption(
+        "--judge-budget-action", choices=BUDGET_ACTIONS, default=None,
+        help="'stop' skips the remaining scenarios; 'downgrade' switches to AZURE_OPENAI_FALLBACK_DEPLOYMENT_NAME. Env: JUDGE_BUDGET_ACTION.",
+    )
+
+
+def pytest_configure(config):
+    # src.test_azure reads TRIAGE_CACHE_MODE when the fixtures first import it
+    if config.getoption("--replay"):
+        os.environ["TRIAGE_CACHE_MODE"] = "replay"
+    elif config.getoption("--triage-cache"):
+        os.environ["TRIAGE_CACHE_MODE"] = "reuse"
+
+    telemetry_path = config.getoption("--telemetry-jsonl")
+    if telemetry_path and not config.option.collectonly:
+        # One file per pytest-xdist worker so the workers never interleave lines
+        worker = os.environ.get("PYTEST_XDIST_WORKER")
+        if worker:
+            root, ext = os.path.splitext(telemetry_path)
+            telemetry_path = f"{root}-{worker}{ext}"
+        os.makedirs(os.path.dirname(telemetry_path) or ".", exist_ok=True)
+        open_run_log(telemetry_path)
 
-def load_bias_scenarios() -> list[dict]:
-    """Provides the list of metadata for all bias test cases."""
-    return load_manifest("bias/dataset_bias.json")
 
-def load_tierB_scenarios() -> list[dict]:
-    """Provides the list of metadata for all high risk test cases."""
-    return load_manifest("tierB/dataset_tierB.json")
+    # Command line budget options override the .env values
+    usage = get_judge_usage()
+    if config.getoption("--judge-token-budget") is not None:
+        usage.token_budget = config.getoption("--judge-token-budget")
+    if config.getoption("--judge-cost-budget") is not None:
+        usage.cost_budget = config.getoption("--judge-cost-budget")
+    if config.getoption("--judge-budget-action") is not None:
+        usage.action = config.getoption("--judge-budget-action")
 
-def load_tierC_scenarios() -> list[dict]:
-    """Provides the list of metadata for all high risk test cases."""
-    return load_manifest("tierC/dataset_tierC.json")
 
-def load_mismatches_scenarios() -> list[dict]:
-    """Provides the list of metadata for all mismatches test cases."""
-    return load_manifest("mismatches/dataset_mismatches.json")
+def pytest_unconfigure(config):
+    close_run_log()
 
-def load_finances_scenarios() -> list[dict]:
-    """Provides the list of metadata for all finances test cases."""
-    return load_manifest("finances/dataset_finances.json")
 
-def load_adherence_scenarios() -> list[dict]:
-    """Provides the list of metadata for all prompt adherence test cases."""
-    return load_manifest("prompt_adherence/dataset_adherence.json")
+def pytest_sessionfinish(session):
+    # pytest-xdist workers hand their judge usage and dedup counts to the controller for the summary
+    if hasattr(session.config, "workeroutput"):
+        from src.triage_client import get_single_flight
+        single_flight = get_single_flight()
+        session.config.workeroutput["judge_usage"] = get_judge_usage().as_rows()
+        session.config.workeroutput["triage_dedup"] = single_flight.stats() if single_flight else {}
+        pool = session.config.stash.get(JUDGE_POOL, None)
+        session.config.workeroutput["judge_pool"] = pool.summary() if pool else []
+        escalation = session.config.stash.get(JUDGE_ESCALATION, None)
+        session.config.workeroutput["judge_escalation"] = escalation.stats() if escalation else {}
+        sampler = session.config.stash.get(JUDGE_SAMPLER, None)
+        session.config.workeroutput["judge_samples"] = sampler.stats() if sampler else {}
 
-def load_incomplete_data_scenarios() -> list[dict]:
-    """Provides the list of metadata for all incomplete data test cases."""
-    return load_manifest("incomplete_data/dataset_incomplete.json")
 
-def load_boundary_values_scenarios() -> list[dict]:
-    """Provides the list of metadata for all boundary values test cases."""
-    return load_manifest("boundary_values/dataset_boundary.json")
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    from src.triage_client import get_single_flight
+    workeroutput = getattr(node, "workeroutput", {})
+    get_judge_usage().merge(workeroutput.get("judge_usage", []))
+    single_flight = get_single_flight()
+    if single_flight is not None:
+        single_flight.merge(workeroutput.get("triage_dedup", {}))
+    _merge_pool_rows(node.config, workeroutput.get("judge_pool", []))
+    if workeroutput.get("judge_escalation"):
+        node.config.stash.setdefault(JUDGE_ESCALATION_ROWS, []).append(workeroutput["judge_escalation"])
+    if workeroutput.get("judge_samples"):
+        node.config.stash.setdefault(JUDGE_SAMPLER_ROWS, []).append(workeroutput["judge_samples"])
+
+
+def _merge_pool_rows(config, rows: list):
+    merged = config.stash.setdefault(JUDGE_POOL_ROWS, {})
+    for row in rows:
+        target = merged.setdefault(row["deployment"], dict(row, calls=0, throttled=0, ejections=0))
+        for name in ("calls", "throttled", "ejections"):
+            target[name] += row[name]
+
+
+def pytest_terminal_summary(terminalreporter):
+    from src.triage_client import get_single_flight
+    single_flight = get_single_flight()
+    dedup = single_flight.stats() if single_flight else {}
+    if dedup.get("requests"):
+        terminalreporter.write_sep("=", "triage request dedup")
+        terminalreporter.write_line(
+            f"{dedup['requests']} triage requests: {dedup['calls']} made a call, {dedup['shared']} shared another "
+            f"scenario's call for the same payload (hit rate {dedup['hit_rate']:.1%})"
+        )
+
+    pool = terminalreporter.config.stash.get(JUDGE_POOL, None)
+    if pool is not None:
+        _merge_pool_rows(terminalreporter.config, pool.summary())
+    pool_rows = list(terminalreporter.config.stash.get(JUDGE_POOL_ROWS, {}).values())
+    if len(pool_rows) > 1:
+        terminalreporter.write_sep("=", "judge deployment pool")
+        for row in pool_rows:
+            terminalreporter.write_line(
+                f"{row['deployment']:<60} weight {row['weight']:<4g} {row['calls']:>6} calls "
+                f"{row['throttled']:>5} throttled {row['ejections']:>4} ejections"
+            )
+
+    escalation_rows = list(terminalreporter.config.stash.get(JUDGE_ESCALATION_ROWS, []))
+    escalation = terminalreporter.config.stash.get(JUDGE_ESCALATION, None)
+    if escalation is not None:
+        escalation_rows.append(escalation.stats())
+    if escalation_rows:
+        metrics = sum(row["metrics"] for row in escalation_rows)
+        escalated = sum(row["escalated"] for row in escalation_rows)
+        terminalreporter.write_sep("=", "judge escalation")
+        terminalreporter.write_line(
+            f"{metrics} metric evaluations scored by the cheap judge: {escalated} borderline ones escalated to the "
+            f"strong judge, {metrics - escalated} strong-judge calls saved "
+            f"({(metrics - escalated) / metrics if metrics else 0:.1%})"
+        )
+
+    sampler_rows = list(terminalreporter.config.stash.get(JUDGE_SAMPLER_ROWS, []))
+    sampler = terminalreporter.config.stash.get(JUDGE_SAMPLER, None)
+    if sampler is not None:
+        sampler_rows.append(sampler.stats())
+    if sampler_rows:
+        totals = {name: sum(row[name] for row in sampler_rows) for name in ("metrics", "samples", "undecided", "max_samples")}
+        terminalreporter.write_sep("=", "judge repeat sampling")
+        terminalreporter.write_line(
+            f"{totals['metrics']} metrics scored with {totals['samples']} judge samples "
+            f"({totals['samples'] / totals['metrics'] if totals['metrics'] else 0:.2f} per metric, "
+            f"{totals['max_samples'] - totals['samples']} fewer than {totals['max_samples']} without early stopping); "
+            f"{totals['undecided']} still ambiguous after the maximum"
+        )
+
+    usage = get_judge_usage()
+    if not usage.rows:
+        return
+    terminalreporter.write_sep("=", "judge token usage")
+    for line in usage.summary_lines():
+        terminalreporter.write_line(line)
 
 
 # --- Function to convert manifest item into an LLMTestCase ---
 
-def create_deepeval_test_case(scenario: dict) -> LLMTestCase:
+def create_deepeval_test_case(scenario: dict) -> "LLMTestCase":
     """
     Takes a dictionary from the manifest, reads the input file,
     CALLS THE API FOR OUTPUT, and builds the full LLMTestCase.
     """
+    from deepeval.test_case import LLMTestCase
+    from src.test_azure import get_ai_output_from_api, get_retrieval_contexts
     
     # 1. DEFINE PATH VARIABLES
     root_dir = os.path.dirname(os.path.abspath(__file__)) 
@@ -87,13 +255,47 @@ def create_deepeval_test_case(scenario: dict) -> LLMTestCase:
         # ... meta data ...
     )
 
+async def a_create_deepeval_test_case(scenario: dict, output_root: str = None) -> "LLMTestCase":
+    """
+    Async version of create_deepeval_test_case used by the concurrent scenario runner.
+    output_root redirects the written output files (benchmarks use a temp directory).
+    """
+    from deepeval.test_case import LLMTestCase
+    from src.test_azure import a_get_ai_output_from_api, get_retrieval_contexts
+    root_dir = os.path.dirname(os.path.abspath(__file__))
+    input_content_path = os.path.join(root_dir, "..", "testdata", scenario["input_file"])
+    output_content_path = os.path.join(output_root or os.path.join(root_dir, "..", "testdata"), scenario["output_file"])
+    os.makedirs(os.path.dirname(output_content_path), exist_ok=True)
+    expected_output_string = scenario["expected_output_prompt"]
+
+    with timed("input_read_serialise"):
+        with open(input_content_path, "r") as f:
+            input_data = json.load(f)
+            input_string = json.dumps(input_data, ensure_ascii=False, indent=4)
+
+    actual_output_string = await a_get_ai_output_from_api(input_data, output_content_path)
+
+    with timed("retrieval_context_read"):
+        retrieval_context = get_retrieval_contexts()
+
+    return LLMTestCase(
+        input=input_string,
+        actual_output=actual_output_string,
+        expected_output=expected_output_string,
+        retrieval_context=retrieval_context
+    )
+
 #--- Pytest Fixture for Model Initialization ---
 @pytest.fixture(scope="session")
-def azure_model():
+def azure_model(request):
     """
     Initializes and returns the AzureOpenAIModel instance.
     It will now read variables loaded from your .env file.
     """
+    from src.test_azure import AzureOpenAIModel
+    from src.judge_cache import judge_cache_from_env
+    from src.judge_pool import build_pool
+
     # Load Azure credentials from environment variables
     api_key = os.environ.get("AZURE_OPENAI_API_KEY")
     endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
@@ -107,6 +309,134 @@ def azure_model():
     if not all([api_key, endpoint, deployment_name]):
         pytest.fail("Please set all required Azure OpenAI environment variables in your .env file.")
 
+    # Identical prompts are answered from the judge cache unless --no-judge-cache is given
+    # (repeat sampling needs fresh answers, so --judge-samples turns it off too)
+    no_cache = request.config.getoption("--no-judge-cache") or request.config.getoption("--judge-samples") > 1
+    cache = None if no_cache else judge_cache_from_env()
+
+    # Cheaper deployment to switch to when the judge budget runs out (--judge-budget-action downgrade)
+    fallback_deployment_name = os.environ.get("AZURE_OPENAI_FALLBACK_DEPLOYMENT_NAME")
+
+    # Global-Batch deployment for --judge-batch runs (defaults to deployment_name)
+    batch_deployment_name = os.environ.get("AZURE_OPENAI_BATCH_DEPLOYMENT_NAME")
+
+    # Deployments to spread the judge calls over (AZURE_OPENAI_DEPLOYMENTS, see src/judge_pool.py)
+    pool = build_pool(api_key, endpoint, api_version, deployment_name, os.environ.get("AZURE_OPENAI_DEPLOYMENTS"))
+    request.config.stash[JUDGE_POOL] = pool
+
     # Initialize and return the custom model wrapper
-    return AzureOpenAIModel(api_key, endpoint, api_version, deployment_name, temperature)
+    return AzureOpenAIModel(api_key, endpoint, api_version, deployment_name, temperature, cache,
+                            fallback_deployment_name=fallback_deployment_name,
+                            batch_mode=request.config.getoption("--judge-batch"),
+                            batch_deployment_name=batch_deployment_name,
+                            pool=pool)
+
+
+@pytest.fixture(scope="session")
+def cheap_judge_model(request, azure_model):
+    """
+    The cheap/fast judge for --judge-escalation runs (AZURE_OPENAI_CHEAP_DEPLOYMENT_NAME,
+    on the same endpoint), or None when escalation is off.
+    """
+    if not request.config.getoption("--judge-escalation"):
+        return None
+    from src.test_azure import AzureOpenAIModel
+    from src.judge_pool import build_pool
 
+    cheap_deployment_name = os.environ.get("AZURE_OPENAI_CHEAP_DEPLOYMENT_NAME")
+    if not cheap_deployment_name:
+        pytest.fail("--judge-escalation needs AZURE_OPENAI_CHEAP_DEPLOYMENT_NAME in your .env file.")
+
+    api_key = os.environ.get("AZURE_OPENAI_API_KEY")
+    endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
+    # The cheap deployment has its own quota, so its own rate limiter
+    pool = build_pool(api_key, endpoint, azure_model.api_version, cheap_deployment_name, limiter="judge:cheap")
+    return AzureOpenAIModel(api_key, endpoint, azure_model.api_version, cheap_deployment_name, azure_model.temperature,
+                            azure_model.cache, pool=pool)
+
+
+#--- Allure Helpers ---
+def attach_call_telemetry(scenario_result):
+    """Attaches the scenario's phase timings and per-call telemetry to the Allure test."""
+    allure.attach(
+        json.dumps(scenario_result.timings.as_report(), indent=4),
+        name="Call Telemetry",
+        attachment_type=allure.attachment_type.JSON
+    )
+
+
+#--- Pytest Fixtures for Concurrent Scenario Evaluation ---
+@pytest.fixture(scope="session")
+def scenario_runner(request, azure_model, cheap_judge_model):
+    """
+    Session-wide runner that evaluates the selected scenarios of every category concurrently.
+    Each category's metrics are built once by the evaluation engine (src/engine.py).
+    Set SCENARIO_CONCURRENCY in your .env file to change how many run at once.
+    Every verdict is recorded in the eval index (EVAL_INDEX_PATH) for --changed-only runs.
+    With --judge-escalation the cheap judge scores first (src/escalation.py);
+    with --judge-samples N each metric is scored up to N times (src/sampling.py);
+    with --judge-combined a scenario's metrics share one judge call (src/combined_judge.py).
+    """
+    from src.runner import ScenarioRunner, DEFAULT_CONCURRENCY
+    from src.engine import EvaluationEngine
+    from src.fingerprints import eval_index_from_env
+    from src.escalation import JudgeEscalation, DEFAULT_BAND
+    from src.sampling import RepeatSampler, DEFAULT_MIN_SAMPLES, DEFAULT_STEP, DEFAULT_CONFIDENCE
+    from src.combined_judge import CombinedJudge
+
+    max_concurrency = int(os.environ.get("SCENARIO_CONCURRENCY", DEFAULT_CONCURRENCY))
+    engine = EvaluationEngine(azure_model)
+    index = eval_index_from_env()
+    escalation = None
+    if cheap_judge_model is not None:
+        escalation = JudgeEscalation(
+            cheap_judge_model,
+            lambda category: engine.metrics_for(category, cheap_judge_model),
+            band=float(os.environ.get("JUDGE_ESCALATION_BAND", DEFAULT_BAND)),
+        )
+        request.config.stash[JUDGE_ESCALATION] = escalation
+    sampler = None
+    if request.config.getoption("--judge-samples") > 1:
+        sampler = RepeatSampler(
+            request.config.getoption("--judge-samples"),
+            min_samples=int(os.environ.get("JUDGE_SAMPLES_MIN", DEFAULT_MIN_SAMPLES)),
+            step=int(os.environ.get("JUDGE_SAMPLES_STEP", DEFAULT_STEP)),
+            confidence=float(os.environ.get("JUDGE_SAMPLES_CONFIDENCE", DEFAULT_CONFIDENCE)),
+        )
+        request.config.stash[JUDGE_SAMPLER] = sampler
+    runner = ScenarioRunner(azure_model, a_create_deepeval_test_case, engine.metrics_for, max_concurrency,
+                            index=index, changed_only=request.config.getoption("--changed-only"),
+                            escalation=escalation, sampler=sampler,
+                            combined=CombinedJudge() if request.config.getoption("--judge-combined") else None)
+    yield runner
+    runner.close()
+    index.close()
+
+
+@pytest.fixture
+def scenario_result(request, scenario_runner, category, scenario_data):
+    """
+    Returns this scenario's evaluation result. The first scenario evaluates
+    every selected scenario of every category at once, through one scheduler.
+    """
+    batch = [
+        (item.callspec.params["category"], item.callspec.params["scenario_data"])
+        for item in request.session.items
+        if hasattr(item, "callspec")
+        and "scenario_data" in item.callspec.params
+    ]
+    # Under pytest-xdist a worker only knows which scenarios it will run with
+    # --dist loadfile/loadscope (all of them) or loadgroup (whole categories);
+    # otherwise each test evaluates just its own scenario
+    if os.environ.get("PYTEST_XDIST_WORKER"):
+        dist = request.config.getoption("dist", "no")
+        if dist == "loadgroup":
+            batch = [(c, s) for c, s in batch if c == category]
+        elif dist not in ("loadfile", "loadscope"):
+            batch = [(category, scenario_data)]
+    result = scenario_runner.result_for(category, scenario_data, batch)
+    if result.skipped:
+        pytest.skip(result.skipped)
+    if result.carried_forward:
+        allure.dynamic.tag("carried-forward")
+    return result
@@ -0,0 +1,83 @@
+import pytest
+import allure
+
+# Import the Allure helper from conftest.py
+from tests.conftest import attach_call_telemetry
+from src.engine import load_categories, load_scenarios
+from src.runner import metric_details
+
+# --- Scenario Definitions ---
+# Every category (manifest + metrics) is defined in testdata/categories.json
+# (EVAL_CATEGORIES); the metrics are built by the evaluation engine in src/engine.py.
+# Select a category with -k, e.g. `pytest -k tierA`.
+
+CATEGORIES = load_categories()
+SCENARIOS = load_scenarios(CATEGORIES)
+
+
+# Use pytest.mark.parametrize to run the test function for every scenario of every category
+@pytest.mark.parametrize(
+    "category, scenario_data",
+    # xdist_group keeps a category on one worker with `-n auto --dist loadgroup`,
+    # so each worker evaluates whole categories concurrently
+    [pytest.param(category, scenario, marks=pytest.mark.xdist_group(category)) for category, scenario in SCENARIOS],
+    # Use the category and scenario_name for clear output in the test report
+    ids=[f"{category}-{scenario['scenario_name']}" for category, scenario in SCENARIOS]
+)
+def test_scenario(scenario_result, category, scenario_data):
+
+    test_case = scenario_result.test_case
+
+    # Group the Allure report by category, as the per-category test modules did
+    allure.dynamic.suite(category)
+
+    #ALLURE REPORTING
+    # --- 2. COLLECT METRIC RESULTS ---
+    # The metrics were run by the scenario runner (see scenario_result in conftest.py),
+    # concurrently with the other selected scenarios.
+    results = scenario_result.results
+    test_failed = scenario_result.test_failed
+
+
+    #**********NEW ALLURE REPORTING **********
+    with allure.step(f"Scenario Evaluation: {scenario_data['scenario_name']}"):
+
+    # --- Attach Input Data ---
+    # Attach the input data (assumed to be available as test_case.input)
+    # Using JSON attachment type is good if the input is structured data
+        allure.attach(
+            test_case.input,
+            name="Input Data",
+            attachment_type=allure.attachment_type.JSON
+        )
+
+    # --- Attach Output Data ---
+    # Attach the raw AI output (assumed to be available as test_case.actual_output)
+        allure.attach(
+            test_case.actual_output,
+            name="Output Data",
+            attachment_type=allure.attachment_type.JSON
+        )
+
+    # --- Log Metric Details (Including Threshold) ---
+    for name, data in results.items():
+
+        # 2. Format the detailed metric output as a single text block
+        #    (threshold, repeat samples and escalation tiers included; see src/runner.py)
+        details = metric_details(name, data)
+
+        # 3. Attach the detailed block as a TEXT attachment
+        allure.attach(
+            details,
+            name=f"Metric Result: {name} ({data['status']})",
+            attachment_type=allure.attachment_type.TEXT
+        )
+
+
+    # --- Attach Call Telemetry (timings, retries and tokens per triage/judge call) ---
+    attach_call_telemetry(scenario_result)
+
+
+    # --- 4. FINAL ASSERTION ---
+    # This single, final assertion controls the overall test status in Pytest/Allure.
+    assert test_failed is False, "One or more DeepEval metrics failed. Check attached report details."
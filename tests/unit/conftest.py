@@ -0,0 +1,44 @@
+import json
+import pytest
+import src.response_cache as response_cache
+import src.test_azure as test_azure
+from src.rate_limiter import reset_rate_limiters
+from src.stubs.triage_server import TriageStub, TRIAGE_PATH, load_recordings, start_triage_stub
+from src.triage_client import reset_single_flight
+
+
+#--- Fixtures for the unit tests (no Azure, no real triage endpoint) ---
+
+@pytest.fixture(autouse=True)
+def isolated_rate_limits(tmp_path, monkeypatch):
+    # Under pytest-xdist the limiters share their state through a SQLite file; give each test its own
+    monkeypatch.setenv("RATE_LIMIT_STATE_PATH", str(tmp_path / "rate_limits.sqlite3"))
+    reset_rate_limiters()
+    yield
+    reset_rate_limiters()
+
+
+@pytest.fixture
+def triage_stub(tmp_path, monkeypatch):
+    """
+    Points the triage client at a local stand-in (src/stubs/triage_server.py)
+    replaying the testdata recordings, with the response cache in tmp_path.
+    Yields the stub; stub.stats["requests"] counts what reached the endpoint.
+    """
+    stub = TriageStub(load_recordings())
+    monkeypatch.setenv("TRIAGE_RATE_LIMIT", "1000")
+    monkeypatch.setattr(response_cache, "_cache", response_cache.ResponseCache(str(tmp_path / "triage_cache")))
+    reset_rate_limiters()
+    reset_single_flight()
+    with start_triage_stub(stub) as server:
+        monkeypatch.setattr(test_azure, "API_ENDPOINT", server.base_url + TRIAGE_PATH)
+        yield stub
+    reset_rate_limiters()
+    reset_single_flight()
+
+
+@pytest.fixture
+def triage_input():
+    """A recorded scenario's input payload."""
+    with open("testdata/finances/case_01/input.json", "r", encoding="utf-8") as f:
+        return json.load(f)
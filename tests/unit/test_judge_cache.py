@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from src.judge_cache import JudgeCache
+from src.rate_limiter import reset_rate_limiters
+from tests.unit.test_judge_retries import judge_for, scripted
+
+
+#---- Judge call memoization ------
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = JudgeCache(str(tmp_path / "judge_cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture(autouse=True)
+def fast_judge(monkeypatch):
+    monkeypatch.setenv("JUDGE_RATE_LIMIT", "1000")
+    reset_rate_limiters()
+    yield
+    reset_rate_limiters()
+
+
+def test_key_covers_prompt_deployment_temperature_and_api_version():
+    key = JudgeCache.key("prompt", "gpt-4o", 0.0, "2024-06-01")
+    assert key == JudgeCache.key("prompt", "gpt-4o", 0.0, "2024-06-01")
+    assert key != JudgeCache.key("prompt ", "gpt-4o", 0.0, "2024-06-01")
+    assert key != JudgeCache.key("prompt", "gpt-4o-mini", 0.0, "2024-06-01")
+    assert key != JudgeCache.key("prompt", "gpt-4o", 1.0, "2024-06-01")
+    assert key != JudgeCache.key("prompt", "gpt-4o", 0.0, "2024-10-21")
+
+
+def test_entries_persist_and_count_hits(cache, tmp_path):
+    key = JudgeCache.key("prompt", "gpt-4o", 0.0, "2024-06-01")
+    assert cache.get(key) is None
+    cache.put(key, "{\"score\": 8}")
+    assert cache.get(key) == "{\"score\": 8}"
+    assert (cache.hits, cache.misses) == (1, 1)
+    reopened = JudgeCache(cache.path)
+    assert reopened.get(key) == "{\"score\": 8}"
+    reopened.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = JudgeCache(str(tmp_path / "judge_cache.sqlite3"), max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")  # now the most recently used
+    cache.put("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
+    cache.close()
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_repeated_prompt_is_served_from_cache(cache, mode):
+    handle, requests = scripted()
+    judge = judge_for(handle)
+    judge.cache = cache
+    for _ in range(3):
+        if mode == "sync":
+            assert judge.generate("prompt") == "{\"score\": 8}"
+        else:
+            assert asyncio.run(judge.a_generate("prompt")) == "{\"score\": 8}"
+    assert len(requests) == 1
+    # Cached answers are counted as judge calls without tokens
+    row = judge.usage.rows[("-", "-", "judge")]
+    assert (row["calls"], row["cached"], row["prompt_tokens"]) == (3, 2, 10)
+
+
+def test_other_prompt_or_temperature_is_a_miss(cache):
+    handle, requests = scripted()
+    judge = judge_for(handle)
+    judge.cache = cache
+    judge.generate("prompt")
+    judge.generate("another prompt")
+    judge.temperature = 1.0
+    judge.generate("prompt")
+    assert len(requests) == 3
+
+
+def test_response_format_key_is_stable_under_key_order(cache):
+    handle, requests = scripted()
+    judge = judge_for(handle)
+    judge.cache = cache
+    schema = {"type": "json_schema", "json_schema": {"name": "scores", "schema": {"type": "object", "properties": {}}}}
+    reordered = {"json_schema": {"schema": {"properties": {}, "type": "object"}, "name": "scores"}, "type": "json_schema"}
+    asyncio.run(judge.a_generate_json("prompt", schema))
+    asyncio.run(judge.a_generate_json("prompt", reordered))
+    assert len(requests) == 1
+    # The same prompt without a schema is a different request
+    asyncio.run(judge.a_generate("prompt"))
+    assert len(requests) == 2
@@ -0,0 +1,117 @@
+import asyncio
+import httpx2
+import pytest
+from openai import APIConnectionError, APIStatusError, AsyncAzureOpenAI, AzureOpenAI
+import src.test_azure as test_azure
+from src.judge_pool import DeploymentPool, JudgeDeployment
+from src.judge_usage import JudgeUsage
+from src.rate_limiter import get_rate_limiter, reset_rate_limiters
+from src.test_azure import AzureOpenAIModel
+
+
+#---- Judge retries (AzureOpenAIModel._generate / _a_generate) ------
+
+COMPLETION = {
+    "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "judge",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "{\"score\": 8}"}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+}
+
+
+def scripted(*steps):
+    """A transport handler answering each request with the next step: an HTTP status, or "connect" for a connection error."""
+    requests = []
+
+    def handle(request):
+        requests.append(request)
+        step = steps[len(requests) - 1] if len(requests) <= len(steps) else 200
+        if step == "connect":
+            raise httpx2.ConnectError("connection refused", request=request)
+        if step == 200:
+            return httpx2.Response(200, json=COMPLETION)
+        return httpx2.Response(step, headers={"retry-after": "0"}, json={"error": {"message": f"HTTP {step}"}})
+    return handle, requests
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setenv("JUDGE_RATE_LIMIT", "1000")
+    monkeypatch.setattr(test_azure, "JUDGE_BASE_WAIT_SECONDS", 0.0)
+    reset_rate_limiters()
+    yield
+    reset_rate_limiters()
+
+
+def judge_for(handle) -> AzureOpenAIModel:
+    """An AzureOpenAIModel whose one deployment answers through handle."""
+    deployment = JudgeDeployment("judge", "http://judge.test", "key", "2024-06-01")
+    deployment.sync_client = AzureOpenAI(
+        api_key="key", api_version="2024-06-01", azure_endpoint="http://judge.test", max_retries=0,
+        http_client=httpx2.Client(transport=httpx2.MockTransport(handle)),
+    )
+    deployment.async_client = AsyncAzureOpenAI(
+        api_key="key", api_version="2024-06-01", azure_endpoint="http://judge.test", max_retries=0,
+        http_client=httpx2.AsyncClient(transport=httpx2.MockTransport(handle)),
+    )
+    return AzureOpenAIModel("key", "http://judge.test", "2024-06-01", "judge", 0.0, usage=JudgeUsage(),
+                            pool=DeploymentPool([deployment]))
+
+
+def generate(judge, mode: str) -> str:
+    if mode == "sync":
+        return judge.generate("prompt")
+    return asyncio.run(judge.a_generate("prompt"))
+
+
+@pytest.fixture(params=["sync", "async"])
+def mode(request):
+    return request.param
+
+
+def test_transient_errors_are_retried(mode):
+    handle, requests = scripted(503, "connect", 500)
+    assert generate(judge_for(handle), mode) == "{\"score\": 8}"
+    assert len(requests) == 4
+
+
+def test_transient_retries_run_out(mode):
+    handle, requests = scripted(*[503] * 10)
+    with pytest.raises(APIStatusError):
+        generate(judge_for(handle), mode)
+    assert len(requests) == test_azure.JUDGE_TRANSIENT_RETRIES + 1
+
+
+def test_client_errors_are_not_retried(mode):
+    handle, requests = scripted(400)
+    with pytest.raises(APIStatusError):
+        generate(judge_for(handle), mode)
+    assert len(requests) == 1
+
+
+def test_rate_limit_slows_limiter_and_retries(mode):
+    handle, requests = scripted(429, 429)
+    judge = judge_for(handle)
+    assert generate(judge, mode) == "{\"score\": 8}"
+    assert len(requests) == 3
+    # Each retry was sent after the previous cut, so each 429 cuts the rate again
+    limiter = get_rate_limiter("judge")
+    assert limiter.rate == pytest.approx(1000 * limiter.decrease ** 2 + limiter.increase)
+    assert judge.pool.primary.stats["throttled"] == 2
+
+
+def test_last_attempt_raises(mode, monkeypatch):
+    # Rate limits are retried without a transient-retry cap, until MAX_RETRIES attempts are used
+    monkeypatch.setattr(test_azure, "MAX_RETRIES", 3)
+    handle, requests = scripted(429, 429, 429, 429)
+    with pytest.raises(APIStatusError) as raised:
+        generate(judge_for(handle), mode)
+    assert raised.value.status_code == 429
+    assert len(requests) == 3
+
+
+def test_last_attempt_raises_connection_error(mode, monkeypatch):
+    monkeypatch.setattr(test_azure, "MAX_RETRIES", 2)
+    handle, requests = scripted("connect", "connect", "connect")
+    with pytest.raises(APIConnectionError):
+        generate(judge_for(handle), mode)
+    assert len(requests) == 2
@@ -0,0 +1,176 @@
+import json
+import re
+import pytest
+from src.engine import load_manifest
+from src.prechecks import PrecheckError, check_rule, is_error_output, parse_triage_output, rules_for, run_prechecks
+
+
+#---- Deterministic pre-checks, fed by the recorded triage outputs in testdata/ ------
+
+def recorded(output_file: str) -> str:
+    with open(f"testdata/{output_file}", encoding="utf-8") as f:
+        return f.read()
+
+
+def edited(output_file: str, edit) -> str:
+    """A recorded output with edit(data) applied to its parsed JSON."""
+    data = json.loads(recorded(output_file))
+    edit(data)
+    return json.dumps(data)
+
+
+def scenario(manifest: str, name: str) -> dict:
+    return next(s for s in load_manifest(manifest) if s["scenario_name"] == name)
+
+
+def first_flag(**fields):
+    return lambda data: data["content"]["triageFlags"][0].update(fields)
+
+
+@pytest.fixture(autouse=True)
+def prechecks_on(monkeypatch):
+    monkeypatch.setenv("PRECHECKS", "on")
+
+
+ERROR_PAYLOADS = [
+    '{"error": "API HTTP Error", "status_code": 500, "details": "Internal Server Error", "recommendation": "Review Required"}',
+    '{"error": "API Connection Failed", "recommendation": "Decline"}',
+    '{"error": "No Recorded Output", "recommendation": "Review Required"}',
+    '{"error": "Input Serialization Failed", "details": "Object of type "Decimal" is not JSON serializable", "recommendation": "Decline"}',
+]
+
+
+@pytest.mark.parametrize("output", ERROR_PAYLOADS)
+def test_error_payload_fails_schema_and_decides(output):
+    assert is_error_output(output)
+    decided, result = run_prechecks(scenario("finances/dataset_finances.json", "Recent_Defaults"), output)
+    assert decided and result["status"] == "FAIL"
+    assert result["reason"].startswith("FAIL schema:")
+
+
+@pytest.mark.parametrize("output, error", [
+    ("not json", "Output is not valid JSON"),
+    ("[]", "Output is not a JSON object"),
+    (ERROR_PAYLOADS[0], "Triage API call failed: API HTTP Error 500"),
+    (edited("finances/case_01/output.json", lambda d: d.update(isSuccessStatusCode=False)), "isSuccessStatusCode is False"),
+    (edited("finances/case_01/output.json", lambda d: d.update(content=[])), "'content' is not a JSON object"),
+    (edited("finances/case_01/output.json", lambda d: d["content"].pop("triageFlags")), "'triageFlags' is missing"),
+    (edited("finances/case_01/output.json", lambda d: d["content"]["triageFlags"][1].pop("reasoning")),
+     "triageFlags[1] is missing reasoning"),
+    (edited("finances/case_01/output.json", first_flag(severity="Severe")), "triageFlags[0] has unknown severity 'Severe'"),
+    (edited("finances/case_01/output.json", lambda d: d["content"].update(reasoning=["a"])), "'reasoning' is not a string"),
+])
+def test_schema_violations(output, error):
+    with pytest.raises(PrecheckError, match=re.escape(error)):
+        parse_triage_output(output)
+
+
+@pytest.mark.parametrize("output_file", ["finances/case_01/output.json", "bias/case_01/output.json", "high_risk/case_07/output.json"])
+def test_recorded_outputs_pass_schema(output_file):
+    assert not is_error_output(recorded(output_file))
+    assert isinstance(parse_triage_output(recorded(output_file))["triageFlags"], list)
+
+
+# rule, recorded output (or edited recorded output) it passes on, one it fails on
+RULE_CASES = [
+    ({"rule": "no_flags"}, recorded("bias/case_01/output.json"), recorded("finances/case_01/output.json")),
+    ({"rule": "max_severity", "severity": "Low"}, recorded("bias/case_01/output.json"), recorded("bias/case_06/output.json")),
+    ({"rule": "max_severity", "severity": "High"}, recorded("tierB/case_05/output.json"), recorded("tierB/case_02/output.json")),
+    ({"rule": "min_severity", "severity": "Medium"}, recorded("tierB/case_01/output.json"), recorded("bias/case_01/output.json")),
+    ({"rule": "min_severity", "severity": "Critical"}, recorded("tierB/case_02/output.json"), recorded("tierB/case_01/output.json")),
+    ({"rule": "mentions", "any": ["DTI", "debt to income"]}, recorded("tierA/case_03/output.json"), recorded("bias/case_07/output.json")),
+    ({"rule": "mentions", "any": ["LTV", "loan to value"]}, recorded("tierA/case_04/output.json"), recorded("bias/case_01/output.json")),
+    ({"rule": "mentions", "any": ["mileage"]}, recorded("tierA/case_10/output.json"), recorded("bias/case_01/output.json")),
+    ({"rule": "mentions", "any": ["search"]}, recorded("tierB/case_09/output.json"), recorded("tierA/case_09/output.json")),
+    ({"rule": "mentions", "any": ["deposit"]}, recorded("tierC/case_11/output.json"), recorded("bias/case_01/output.json")),
+    ({"rule": "mentions", "any": ["postcode", "post code"]},
+     edited("mismatches/case_05/output.json", first_flag(targetField="Applicant.Address.PostCode")),
+     recorded("mismatches/case_05/output.json")),
+    ({"rule": "mentions", "any": ["date of birth", "DOB", "birth"]},
+     edited("mismatches/case_07/output.json", first_flag(title="Date of birth mismatch")),
+     recorded("mismatches/case_07/output.json")),
+    ({"rule": "mentions", "any": ["address"]}, recorded("finances/case_04/output.json"), recorded("mismatches/case_03/output.json")),
+    ({"rule": "mentions", "any": ["fraud"]}, recorded("high_risk/case_05/output.json"), recorded("finances/case_05/output.json")),
+    ({"rule": "mentions", "any": ["default"]}, recorded("high_risk/case_01/output.json"), recorded("finances/case_01/output.json")),
+    ({"rule": "mentions", "any": ["utilisation", "utilization"]}, recorded("tierC/case_05/output.json"),
+     recorded("finances/case_03/output.json")),
+]
+
+
+@pytest.mark.parametrize("rule, passing, failing", RULE_CASES, ids=[
+    f"{rule['rule']}-{rule.get('severity') or rule.get('any', [''])[0]}" for rule, _, _ in RULE_CASES
+])
+def test_rule(rule, passing, failing):
+    assert check_rule(rule, parse_triage_output(passing))[0] is True
+    assert check_rule(rule, parse_triage_output(failing))[0] is False
+
+
+def test_unknown_rule():
+    with pytest.raises(ValueError, match="Unknown pre-check rule 'exact'"):
+        check_rule({"rule": "exact"}, parse_triage_output(recorded("bias/case_01/output.json")))
+
+
+# Manifest scenario, the rules inferred from its expected_output_prompt
+INFERRED_CASES = [
+    (("tierA/dataset_tierA.json", "Atier_AboveMaxDTI"), [{"rule": "mentions", "any": ["DTI", "debt to income"]}]),
+    (("tierB/dataset_tierB.json", "Btier_Over100LTV"), [{"rule": "mentions", "any": ["LTV", "loan to value"]}]),
+    (("tierC/dataset_tierC.json", "Ctier_HighMileage"), [{"rule": "mentions", "any": ["mileage"]}]),
+    (("tierA/dataset_tierA.json", "Atier_HighCreditSearches"), [{"rule": "mentions", "any": ["search"]}]),
+    (("tierC/dataset_tierC.json", "Ctier_LowDeposit"), [{"rule": "mentions", "any": ["deposit"]}]),
+    (("mismatches/dataset_mismatches.json", "Address_Postcode"), [{"rule": "mentions", "any": ["postcode", "post code"]}]),
+    (("mismatches/dataset_mismatches.json", "Date_of_Birth"), [{"rule": "mentions", "any": ["date of birth", "DOB", "birth"]}]),
+    (("mismatches/dataset_mismatches.json", "Address_street"), [{"rule": "mentions", "any": ["address"]}]),
+    (("finances/dataset_finances.json", "Fraud_Markers"), [{"rule": "mentions", "any": ["fraud"]}]),
+    (("finances/dataset_finances.json", "Recent_Defaults"), [{"rule": "mentions", "any": ["default"]}]),
+    (("finances/dataset_finances.json", "High_Credit_Utilization"), [{"rule": "mentions", "any": ["utilisation", "utilization"]}]),
+    (("tierB/dataset_tierB.json", "Btier_high_income"), [{"rule": "min_severity", "severity": "Medium"}]),
+    (("tierA/dataset_tierA.json", "Atier_high_income"), [{"rule": "max_severity", "severity": "Low"}]),
+    (("bias/dataset_bias.json", "control"), [{"rule": "max_severity", "severity": "Low"}]),
+]
+
+
+@pytest.mark.parametrize("where, rules", INFERRED_CASES, ids=[name for (_, name), _ in INFERRED_CASES])
+def test_inferred_rules(where, rules):
+    entry = dict(scenario(*where))
+    # The test exercises the inference, not any rules the manifest may list
+    entry.pop("prechecks", None)
+    assert rules_for(entry) == rules
+
+
+@pytest.mark.parametrize("expected_output_prompt", [
+    # "mentions" rules need the expectation to ask for something to be mentioned
+    "The DTI ratio is within policy",
+    "Consistent decisions regardless of the applicant's postcode",
+])
+def test_no_mention_rule_without_a_mention(expected_output_prompt):
+    assert rules_for({"expected_output_prompt": expected_output_prompt}) == []
+
+
+def test_manifest_rules_take_precedence():
+    entry = {"expected_output_prompt": "The DTI should be mentioned", "prechecks": [{"rule": "no_flags"}]}
+    assert rules_for(entry) == [{"rule": "no_flags"}]
+
+
+# Manifest scenario, recorded output, (decided without the judge, pre-check status)
+DECIDE_CASES = [
+    # prechecks_decide: passing pre-checks settle the scenario
+    (("tierA/dataset_tierA.json", "Atier_high_income"), recorded("tierA/case_01/output.json"), (True, "PASS")),
+    # Otherwise a pass still goes to the judge...
+    (("bias/dataset_bias.json", "control"), recorded("bias/case_01/output.json"), (False, "PASS")),
+    # ...and a failed rule or schema fails without it
+    (("bias/dataset_bias.json", "young_age_bias"), recorded("bias/case_06/output.json"), (True, "FAIL")),
+    (("tierA/dataset_tierA.json", "Atier_high_income"), recorded("tierA/case_02/output.json"), (True, "FAIL")),
+    (("tierA/dataset_tierA.json", "Atier_high_income"), ERROR_PAYLOADS[1], (True, "FAIL")),
+]
+
+
+@pytest.mark.parametrize("where, output, expected", DECIDE_CASES)
+def test_run_prechecks_decides(where, output, expected):
+    decided, result = run_prechecks(scenario(*where), output)
+    assert (decided, result["status"]) == expected
+    assert result["score"] == (1.0 if expected[1] == "PASS" else 0.0)
+
+
+def test_prechecks_off(monkeypatch):
+    monkeypatch.setenv("PRECHECKS", "off")
+    assert run_prechecks(scenario("bias/dataset_bias.json", "control"), ERROR_PAYLOADS[0]) == (False, None)
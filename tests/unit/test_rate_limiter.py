@@ -0,0 +1,103 @@
+import pytest
+from src.rate_limiter import MIN_RATE, AdaptiveRateLimiter, SharedRateLimiter
+
+
+#---- Adaptive (AIMD) rate limiter ------
+
+class FakeClock:
+    """A clock the test moves by hand."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(AdaptiveRateLimiter, "clock", staticmethod(fake))
+    monkeypatch.setattr(SharedRateLimiter, "clock", staticmethod(fake))
+    return fake
+
+
+@pytest.fixture(params=["local", "shared"])
+def make_limiter(request, tmp_path, clock):
+    """Builds an AdaptiveRateLimiter, or a SharedRateLimiter on a fresh SQLite file."""
+    def make(rate=2.0, max_rate=10.0, **kwargs):
+        if request.param == "local":
+            return AdaptiveRateLimiter("judge", rate, max_rate, **kwargs)
+        return SharedRateLimiter("judge", rate, max_rate, path=str(tmp_path / "limits.sqlite3"), **kwargs)
+    return make
+
+
+def test_success_increases_rate_up_to_max(make_limiter):
+    limiter = make_limiter(rate=2.0, max_rate=3.0, increase=0.5)
+    limiter.on_success()
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(3.0)
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(3.0)
+
+
+def test_throttle_decreases_rate_down_to_min(make_limiter):
+    limiter = make_limiter(rate=2.0, decrease=0.5)
+    limiter.on_throttle()
+    assert limiter.rate == pytest.approx(1.0)
+    for _ in range(20):
+        limiter.on_throttle()
+    assert limiter.rate == pytest.approx(MIN_RATE)
+
+
+def test_stale_ticket_does_not_cut_twice(make_limiter):
+    limiter = make_limiter(rate=4.0, decrease=0.5)
+    # Three requests in flight at the old rate, then all three come back 429
+    tickets = [limiter._reserve()[1] for _ in range(3)]
+    for ticket in tickets:
+        limiter.on_throttle(None, ticket)
+    assert limiter.rate == pytest.approx(2.0)
+    # A request scheduled after the cut belongs to the new overload
+    _, ticket = limiter._reserve()
+    limiter.on_throttle(None, ticket)
+    assert limiter.rate == pytest.approx(1.0)
+
+
+def test_throttle_drops_saved_burst(make_limiter):
+    limiter = make_limiter(rate=1.0, burst=3.0)
+    limiter.on_throttle()
+    # Without the cut three callers would go at once; now the first one already waits
+    assert limiter._reserve()[0] == pytest.approx(1 / limiter.rate)
+
+
+def test_throttle_honours_retry_after(make_limiter, clock):
+    limiter = make_limiter(rate=1.0)
+    limiter.on_throttle(retry_after=5)
+    assert limiter._reserve()[0] == pytest.approx(5.0)
+    clock.now += 10
+    assert limiter._reserve()[0] == pytest.approx(0.0)
+
+
+def test_reserve_spaces_callers_at_the_rate(make_limiter, clock):
+    limiter = make_limiter(rate=2.0)
+    waits = [limiter._reserve()[0] for _ in range(3)]
+    assert waits == pytest.approx([0.0, 0.5, 1.0])
+    clock.now += 10
+    assert limiter._reserve()[0] == pytest.approx(0.0)
+
+
+def test_shared_limiter_state_is_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / "limits.sqlite3")
+    worker_1 = SharedRateLimiter("judge", 4.0, 10.0, path=path, run_id="run")
+    worker_2 = SharedRateLimiter("judge", 4.0, 10.0, path=path, run_id="run")
+    other_run = SharedRateLimiter("judge", 4.0, 10.0, path=path, run_id="other")
+
+    _, ticket = worker_1._reserve()
+    worker_2.on_throttle(3, worker_2._reserve()[1])
+    # worker_1's request was scheduled before worker_2's cut: same overload
+    worker_1.on_throttle(None, ticket)
+    assert worker_1._reserve()[0] >= 3
+    assert worker_2.rate == pytest.approx(2.0) and worker_1.rate == pytest.approx(2.0)
+    # Buckets are per run
+    assert other_run._reserve()[0] == pytest.approx(0.0)
+    assert other_run.rate == pytest.approx(4.0)
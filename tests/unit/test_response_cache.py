@@ -0,0 +1,112 @@
+import json
+import os
+import pytest
+import src.test_azure as test_azure
+from src.response_cache import ResponseCache, canonical_json, get_response_cache
+from src.test_azure import get_ai_output_from_api
+
+
+#---- Triage response cache and TRIAGE_CACHE_MODE ------
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch):
+    # Single-flight would share the first output with the later calls; these tests are about the cache
+    monkeypatch.setenv("TRIAGE_DEDUP", "off")
+
+
+def cache_mode(monkeypatch, mode: str):
+    monkeypatch.setattr(test_azure, "TRIAGE_CACHE_MODE", mode)
+
+
+def cache_key(input_data: dict) -> str:
+    return get_response_cache().key(input_data, test_azure.API_ENDPOINT, test_azure.TRIAGE_MODEL_VERSION)
+
+
+def test_record_calls_endpoint_and_stores(triage_stub, triage_input, tmp_path, monkeypatch):
+    cache_mode(monkeypatch, "record")
+    first = get_ai_output_from_api(triage_input, str(tmp_path / "output.json"))
+    second = get_ai_output_from_api(triage_input, str(tmp_path / "output.json"))
+    assert triage_stub.stats["requests"] == 2
+    assert first == second
+    assert get_response_cache().get(cache_key(triage_input)) == first
+    with open(tmp_path / "output.json", "r", encoding="utf-8") as f:
+        assert f.read() == first
+
+
+def test_reuse_calls_endpoint_only_on_a_miss(triage_stub, triage_input, tmp_path, monkeypatch):
+    cache_mode(monkeypatch, "reuse")
+    first = get_ai_output_from_api(triage_input, str(tmp_path / "first.json"))
+    second = get_ai_output_from_api(triage_input, str(tmp_path / "second.json"))
+    assert triage_stub.stats["requests"] == 1
+    assert second == first
+    # A hit still writes the scenario's output file
+    with open(tmp_path / "second.json", "r", encoding="utf-8") as f:
+        assert f.read() == first
+
+
+def test_replay_never_calls_endpoint(triage_stub, triage_input, tmp_path, monkeypatch):
+    cache_mode(monkeypatch, "replay")
+    # Cached output first...
+    get_response_cache().put(cache_key(triage_input), '{"cached": true}')
+    assert get_ai_output_from_api(triage_input, str(tmp_path / "a.json")) == '{"cached": true}'
+    # ...then the scenario's recorded output file...
+    other = {**triage_input, "uncached": 1}
+    (tmp_path / "b.json").write_text('{"recorded": true}', encoding="utf-8")
+    assert get_ai_output_from_api(other, str(tmp_path / "b.json")) == '{"recorded": true}'
+    # ...else an error payload
+    output = get_ai_output_from_api(other, str(tmp_path / "c.json"))
+    assert json.loads(output)["error"] == "No Recorded Output"
+    assert triage_stub.stats["requests"] == 0
+
+
+def test_off_neither_reads_nor_writes(triage_stub, triage_input, tmp_path, monkeypatch):
+    cache_mode(monkeypatch, "off")
+    get_response_cache().put(cache_key(triage_input), '{"cached": true}')
+    output = get_ai_output_from_api(triage_input, str(tmp_path / "output.json"))
+    assert output != '{"cached": true}'
+    assert triage_stub.stats["requests"] == 1
+    assert get_response_cache().get(cache_key(triage_input)) == '{"cached": true}'
+
+
+def test_failed_calls_are_not_cached(triage_stub, triage_input, tmp_path, monkeypatch):
+    cache_mode(monkeypatch, "reuse")
+    triage_stub.unknown = "404"
+    other = {**triage_input, "unrecorded": 1}
+    for _ in range(2):
+        output = get_ai_output_from_api(other, str(tmp_path / "output.json"))
+        assert json.loads(output)["error"] == "API HTTP Error"
+    assert triage_stub.stats["requests"] == 2
+    assert get_response_cache().get(cache_key(other)) is None
+
+
+def test_key_is_stable_under_key_order(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    payload = {"applicant": {"name": "A", "age": 30}, "loan": [{"amount": 1, "term": 2}]}
+    reordered = {"loan": [{"term": 2, "amount": 1}], "applicant": {"age": 30, "name": "A"}}
+    assert canonical_json(payload) == canonical_json(reordered)
+    assert cache.key(payload, "https://triage") == cache.key(reordered, "https://triage")
+    # List order, the endpoint and the model version are part of the key
+    assert cache.key({"loan": [2, 1]}, "https://triage") != cache.key({"loan": [1, 2]}, "https://triage")
+    assert cache.key(payload, "https://triage") != cache.key(payload, "https://other")
+    assert cache.key(payload, "https://triage", "v1") != cache.key(payload, "https://triage", "v2")
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl_seconds=60)
+    cache.put("key", "output")
+    path = tmp_path / "key.json"
+    entry = json.loads(path.read_text(encoding="utf-8"))
+    path.write_text(json.dumps({**entry, "created": entry["created"] - 120}), encoding="utf-8")
+    assert cache.get("key") is None
+    assert not path.exists()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    os.utime(tmp_path / "a.json", (1, 1))
+    os.utime(tmp_path / "b.json", (2, 2))
+    cache.get("a")  # now the most recently used
+    cache.put("c", "3")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("1", None, "3")
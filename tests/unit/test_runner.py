@@ -0,0 +1,86 @@
+import json
+from deepeval.test_case import LLMTestCase
+from src.fingerprints import EvalIndex
+from src.runner import ScenarioRunner, metric_details
+
+
+#---- --changed-only and the eval index ------
+
+SCENARIO = {
+    "scenario_name": "Recent_Defaults",
+    "input_file": "finances/case_01/input.json",
+    "output_file": "finances/case_01/output.json",
+    "expected_output_prompt": "The defaults on credit accounts should be highlighted",
+}
+
+ERROR_OUTPUTS = [
+    '{"error": "API Connection Failed", "recommendation": "Decline"}',
+    '{"error": "API HTTP Error", "status_code": 503, "details": "Service Unavailable", "recommendation": "Review Required"}',
+    '{"error": "No Recorded Output", "recommendation": "Review Required"}',
+]
+
+
+class FakeJudge:
+    deployment_name = "judge"
+    temperature = 0
+    api_version = "test"
+
+    def budget_exhausted(self):
+        return False
+
+
+def run_once(index, actual_output, changed_only):
+    """Evaluates SCENARIO once with a fixed triage output; returns (result, triage calls made)."""
+    calls = []
+
+    async def build_test_case(scenario):
+        calls.append(scenario["scenario_name"])
+        return LLMTestCase(input="{}", actual_output=actual_output, expected_output=scenario["expected_output_prompt"])
+
+    # No metrics: the pre-checks decide every scenario here, so no judge is needed
+    runner = ScenarioRunner(FakeJudge(), build_test_case, lambda category: [], index=index, changed_only=changed_only)
+    try:
+        return runner.result_for("finances", SCENARIO), len(calls)
+    finally:
+        runner.close()
+
+
+def test_recorded_verdict_is_carried_forward(tmp_path, monkeypatch):
+    monkeypatch.setenv("PRECHECKS", "on")
+    with open("testdata/finances/case_01/output.json", encoding="utf-8") as f:
+        recorded = json.dumps(json.load(f))
+    index = EvalIndex(str(tmp_path / "index.sqlite3"))
+
+    first, calls = run_once(index, recorded, changed_only=False)
+    assert calls == 1 and not first.carried_forward
+    again, calls = run_once(index, recorded, changed_only=True)
+    assert calls == 0 and again.carried_forward
+    assert again.results == first.results
+    index.close()
+
+
+def test_error_payload_is_not_recorded(tmp_path, monkeypatch):
+    monkeypatch.setenv("PRECHECKS", "on")
+    index = EvalIndex(str(tmp_path / "index.sqlite3"))
+
+    for output in ERROR_OUTPUTS:
+        first, calls = run_once(index, output, changed_only=False)
+        assert calls == 1 and first.test_failed
+        # A failed triage call is not a verdict: --changed-only must call the endpoint again
+        again, calls = run_once(index, output, changed_only=True)
+        assert calls == 1 and not again.carried_forward
+    index.close()
+
+
+#---- Allure metric details ------
+
+def test_metric_details_includes_samples_and_tiers():
+    data = {
+        "score": 0.85, "threshold": 0.8, "reason": "Mean of 3 samples.", "status": "PASS",
+        "samples": 3, "mean": 0.85, "variance": 0.0025, "sample_scores": [0.8, 0.9, 0.85], "decided": True,
+        "tiers": {"cheap": {"deployment": "mini", "status": "PASS", "score": 0.8, "reason": "Borderline."}},
+    }
+    details = metric_details("Correctness Evaluation", data)
+    assert details.startswith("Metric: Correctness Evaluation\nStatus: PASS\nScore: 0.8500\nThreshold: 0.8000\n")
+    assert "Samples: 3 (mean 0.85, variance 0.0025, decided)" in details
+    assert "[cheap judge: mini] PASS, score 0.8000\nReasoning: Borderline." in details
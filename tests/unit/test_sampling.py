@@ -0,0 +1,85 @@
+import asyncio
+import random
+import statistics
+import pytest
+from src.sampling import RepeatSampler
+
+
+#---- Repeat sampling: early stopping ------
+
+THRESHOLD = 0.8
+MAX_SAMPLES = 9
+
+
+class FakeMetric:
+    def __init__(self, name: str, threshold: float = THRESHOLD):
+        self.name = name
+        self.threshold = threshold
+
+
+def constant_judge(score: float):
+    """A measure_metrics stand-in that gives every metric the same score; counts its calls."""
+    calls = []
+
+    async def measure_metrics(metrics, test_case):
+        calls.append(metrics[0].name)
+        status = "PASS" if score >= metrics[0].threshold else "FAIL"
+        return {metrics[0].name: {"score": score, "threshold": metrics[0].threshold, "reason": "", "status": status}}
+    return measure_metrics, calls
+
+
+@pytest.mark.parametrize("score, samples", [(1.0, 3), (0.0, 3), (0.9, 5), (0.7, 5)])
+def test_unanimous_scores_stop_early(score, samples):
+    sampler = RepeatSampler(MAX_SAMPLES)
+    measure_metrics, calls = constant_judge(score)
+    results = asyncio.run(sampler.measure([FakeMetric("metric")], None, measure_metrics))
+    assert len(calls) == samples
+    assert results["metric"]["samples"] == samples and results["metric"]["decided"]
+
+
+def test_unanimous_threshold_score_uses_every_sample():
+    # A mean exactly on the threshold can never be shown to lie on either side of it
+    sampler = RepeatSampler(MAX_SAMPLES)
+    measure_metrics, calls = constant_judge(THRESHOLD)
+    results = asyncio.run(sampler.measure([FakeMetric("metric")], None, measure_metrics))
+    assert len(calls) == MAX_SAMPLES and not results["metric"]["decided"]
+
+
+def sample(sampler, draw, rng, max_samples):
+    """Scores drawn on RepeatSampler.measure's schedule; returns (decided early, passed)."""
+    scores = [draw(rng) for _ in range(sampler.min_samples)]
+    while len(scores) < max_samples and not sampler.is_decided(scores, THRESHOLD):
+        scores += [draw(rng) for _ in range(min(sampler.step, max_samples - len(scores)))]
+    early = len(scores) < max_samples or sampler.is_decided(scores, THRESHOLD)
+    return early, statistics.fmean(scores) >= THRESHOLD
+
+
+def two_valued(low: float, high: float, mean: float):
+    """A judge whose scores are low or high, with the given true mean."""
+    p_high = (mean - low) / (high - low)
+    return lambda rng: high if rng.random() < p_high else low
+
+
+# (low score, high score) of a two-valued judge, and true mean scores around the threshold
+SCORE_PAIRS = [(0.7, 0.9), (0.6, 1.0), (0.5, 0.9), (0.7, 1.0), (0.7, 0.8), (0.8, 0.9)]
+TRUE_MEANS = [0.7, 0.75, 0.78, 0.79, 0.81, 0.82, 0.85, 0.9]
+TRIALS = 2000
+
+
+@pytest.mark.parametrize("low, high", SCORE_PAIRS)
+def test_wrong_early_verdict_rate(low, high):
+    sampler = RepeatSampler(MAX_SAMPLES)
+    rng = random.Random(f"{low}-{high}")
+    for mean in [m for m in TRUE_MEANS if low <= m <= high]:
+        draw = two_valued(low, high, mean)
+        wrong_early = wrong = wrong_at_max = 0
+        for _ in range(TRIALS):
+            early, passed = sample(sampler, draw, rng, MAX_SAMPLES)
+            wrong_early += early and passed != (mean >= THRESHOLD)
+            wrong += passed != (mean >= THRESHOLD)
+            wrong_at_max += (statistics.fmean(draw(rng) for _ in range(MAX_SAMPLES)) >= THRESHOLD) != (mean >= THRESHOLD)
+        # Stopping early gives (within simulation noise) no more wrong verdicts than always taking N samples...
+        assert wrong / TRIALS <= wrong_at_max / TRIALS + 0.04, (low, high, mean)
+        # ...and a metric a full score step from the threshold is rarely stopped on the wrong side
+        if abs(mean - THRESHOLD) >= 0.1 - 1e-9:
+            assert wrong_early / TRIALS <= 0.05, (low, high, mean)
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+import pytest
+import src.test_azure as test_azure
+from src.stubs.common import Latency
+from src.test_azure import a_get_ai_output_from_api, get_ai_output_from_api
+from src.triage_client import get_single_flight
+
+
+#---- Single-flight: identical triage payloads share one request ------
+
+CALLERS = 5
+
+
+@pytest.fixture(autouse=True)
+def dedup_on(triage_stub, monkeypatch):
+    monkeypatch.setenv("TRIAGE_DEDUP", "on")
+    monkeypatch.setattr(test_azure, "TRIAGE_CACHE_MODE", "off")
+    # Slow enough that every caller arrives while the first request is in flight
+    triage_stub.latency = Latency("fixed:0.3")
+
+
+def call_concurrently(payloads: list, tmp_path) -> list:
+    """Calls get_ai_output_from_api for every payload at once, one thread each; returns the outputs."""
+    outputs = [None] * len(payloads)
+    start = threading.Barrier(len(payloads))
+
+    def call(i):
+        start.wait()
+        outputs[i] = get_ai_output_from_api(payloads[i], str(tmp_path / f"output_{i}.json"))
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(payloads))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outputs
+
+
+def test_concurrent_identical_calls_make_one_request(triage_stub, triage_input, tmp_path):
+    outputs = call_concurrently([triage_input] * CALLERS, tmp_path)
+    assert triage_stub.stats["requests"] == 1
+    assert len(set(outputs)) == 1 and "error" not in json.loads(outputs[0])
+    assert get_single_flight().stats() == {"requests": CALLERS, "calls": 1, "shared": CALLERS - 1,
+                                           "hit_rate": round((CALLERS - 1) / CALLERS, 4)}
+    # Every scenario still gets its own output file
+    for i in range(CALLERS):
+        assert (tmp_path / f"output_{i}.json").read_text(encoding="utf-8") == outputs[0]
+
+
+def test_concurrent_identical_async_calls_make_one_request(triage_stub, triage_input, tmp_path):
+    async def run():
+        return await asyncio.gather(*(
+            a_get_ai_output_from_api(triage_input, str(tmp_path / f"output_{i}.json")) for i in range(CALLERS)
+        ))
+    outputs = asyncio.run(run())
+    assert triage_stub.stats["requests"] == 1
+    assert len(set(outputs)) == 1
+
+
+def test_key_order_does_not_matter(triage_stub, triage_input, tmp_path):
+    reordered = dict(reversed(list(triage_input.items())))
+    call_concurrently([triage_input, reordered], tmp_path)
+    assert triage_stub.stats["requests"] == 1
+
+
+def test_different_payloads_are_not_shared(triage_stub, triage_input, tmp_path):
+    outputs = call_concurrently([triage_input, {**triage_input, "other": 1}], tmp_path)
+    assert triage_stub.stats["requests"] == 2
+    assert outputs[0] != outputs[1]
+
+
+def test_failed_call_is_not_kept(triage_stub, triage_input, tmp_path):
+    triage_stub.unknown = "404"
+    unrecorded = {**triage_input, "unrecorded": 1}
+    for i in range(2):
+        output = get_ai_output_from_api(unrecorded, str(tmp_path / f"output_{i}.json"))
+        assert json.loads(output)["error"] == "API HTTP Error"
+    # The second scenario asked again instead of reusing the failure
+    assert triage_stub.stats["requests"] == 2
+
+
+def test_dedup_off(triage_stub, triage_input, tmp_path, monkeypatch):
+    monkeypatch.setenv("TRIAGE_DEDUP", "off")
+    call_concurrently([triage_input] * 3, tmp_path)
+    assert triage_stub.stats["requests"] == 3